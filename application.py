@@ -1,13 +1,107 @@
-from flask import Flask,request,render_template
+import os
+import threading
+
+from flask import Flask,request,render_template,jsonify,Response
 import numpy as np
-import pandas as pd
 
-from sklearn.preprocessing import StandardScaler
-from src.models.predict_model import CustomData,PredictPipeline 
+from src.models.predict_model import PredictPipeline,parse_features,warm_up
+from src.models.input_record import HouseFeatures
+from src.features.feature_spec import FORM_FIELDS
+from src.models.micro_batcher import MicroBatcher,MicroBatcherConfig
+from src.models.prediction_cache import PredictionCache,PredictionCacheConfig
+from src.logger import logging
+from src import instrumentation
+from src.instrumentation import span
 
 application=Flask(__name__)
 
 app=application
+# upper bound on rows accepted by a single /api/v1/predict call
+app.config.setdefault('MAX_BATCH_ROWS', 100000)
+# optional server-side coalescing of concurrent small requests
+app.config.setdefault('MICRO_BATCHING', os.environ.get('AMES_MICRO_BATCHING', '0') == '1')
+app.config.setdefault('MICRO_BATCH_MAX_ROWS', int(os.environ.get('AMES_MICRO_BATCH_MAX_ROWS', 256)))
+app.config.setdefault('MICRO_BATCH_MAX_WAIT_MS', float(os.environ.get('AMES_MICRO_BATCH_MAX_WAIT_MS', 3.0)))
+# optional LRU/TTL cache of predictions for repeated listings
+app.config.setdefault('PREDICTION_CACHE', os.environ.get('AMES_PREDICTION_CACHE', '0') == '1')
+app.config.setdefault('PREDICTION_CACHE_MAX_ENTRIES', int(os.environ.get('AMES_PREDICTION_CACHE_MAX_ENTRIES', 100000)))
+app.config.setdefault('PREDICTION_CACHE_TTL', float(os.environ.get('AMES_PREDICTION_CACHE_TTL', 3600)))
+# per-stage timing histograms served on /metrics
+app.config.setdefault('METRICS', os.environ.get('AMES_METRICS', '0') == '1')
+if app.config['METRICS']:
+    instrumentation.enable()
+
+_batcher = None
+_prediction_cache = None
+# concurrent first requests (threaded server, asgi's thread pool) must not
+# each create, and start, their own batcher or cache
+_singleton_lock = threading.Lock()
+_warmed_up = False
+
+# form fields home.html lays out by hand; inputs of any other selected
+# feature (AMES_FEATURE_SET) are rendered by a generic loop
+_TEMPLATE_FIELDS = {
+    'Overall_Qual', 'Gr_Liv_Area', 'First_Flr_SF', 'Lot_Area', 'Garage_Cars', 'Garage_Area',
+    'Total_Bsmt_SF', 'BsmtFin_SF_1', 'Full_Bath', 'Yr_Sold', 'Year_Remod_Add',
+}
+
+
+@app.context_processor
+def form_fields():
+    # (name, input step): int fields only accept whole numbers
+    return {'extra_fields': [
+        (field, '1' if kind is int else 'any') for field, kind in FORM_FIELDS if field not in _TEMPLATE_FIELDS
+    ]}
+
+
+def get_batcher():
+    global _batcher
+    if _batcher is None:
+        with _singleton_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(config=MicroBatcherConfig(
+                    max_batch_rows=app.config['MICRO_BATCH_MAX_ROWS'],
+                    max_wait_ms=app.config['MICRO_BATCH_MAX_WAIT_MS'],
+                )).start()
+    return _batcher
+
+
+def get_prediction_cache():
+    global _prediction_cache
+    if _prediction_cache is None:
+        with _singleton_lock:
+            if _prediction_cache is None:
+                _prediction_cache = PredictionCache(PredictionCacheConfig(
+                    max_entries=app.config['PREDICTION_CACHE_MAX_ENTRIES'],
+                    ttl=app.config['PREDICTION_CACHE_TTL'],
+                ))
+    return _prediction_cache
+
+
+def _predict_uncached(features):
+    # coalesced with concurrent requests if micro batching is enabled
+    if app.config['MICRO_BATCHING'] and len(features) < app.config['MICRO_BATCH_MAX_ROWS']:
+        return get_batcher().predict(features)
+    return PredictPipeline().predict_batch(features)
+
+
+def run_prediction(features):
+    # 1-D array of predictions; cached rows skip transform and inference
+    if app.config['PREDICTION_CACHE']:
+        version = PredictPipeline().model_version
+        return get_prediction_cache().predict(features, _predict_uncached, version)
+    return _predict_uncached(features)
+
+
+def serve_prediction(features, routed=False):
+    # the prediction path behind every route, Flask's and asgi.py's:
+    # routed requests go to the registry's canary/shadow when it has one,
+    # everything else through run_prediction (cache, micro batching)
+    if routed:
+        pipeline = PredictPipeline()
+        if pipeline.registry.routes_traffic:
+            return pipeline.predict_routed(features)[0]
+    return run_prediction(features)
 
 ## Route for a home page
 
@@ -27,34 +121,86 @@ def predict_datapoint():
         return render_template('home.html')
     else:
         try:
-            data=CustomData(
-                # CONVERT TO FLOAT/INT HERE before passing
-                Overall_Qual=int(request.form.get('Overall_Qual')), # Should be float/int
-                Gr_Liv_Area=int(request.form.get('Gr_Liv_Area')),   # Should be float/int
-                Garage_Cars=float(request.form.get('Garage_Cars')),   # Should be float/int
-                Garage_Area=float(request.form.get('Garage_Area')),   # Should be float/int
-                First_Flr_SF=int(request.form.get('First_Flr_SF')), 
-                Total_Bsmt_SF=float(request.form.get('Total_Bsmt_SF')),
-                Lot_Area=int(request.form.get('Lot_Area')),
-                BsmtFin_SF_1=float(request.form.get('BsmtFin_SF_1')),
-                Full_Bath=int(request.form.get('Full_Bath')),
-                year_since_remod=int(request.form.get('year_since_remod'))
-            )
+            with span("request_parse"):
+                data=HouseFeatures.parse(request.form)
         except ValueError as e:
             # Handle cases where the user enters non-numeric data in a number field
-            return render_template('home.html', results=f"Error: Invalid input format. Please ensure all fields are numbers. Detail: {e}")
+            return render_template('home.html', results=invalid_form_message(e))
             
-        
-        pred_df=data.get_data_as_data_frame()
-        print("Prediction Input DataFrame:\n", pred_df)
+        # sampled and only rendered if kept (AMES_LOG_LEVEL=DEBUG)
+        logging.debug("Prediction input: %s", data)
 
-        predict_pipeline=PredictPipeline()
-        results=predict_pipeline.predict(pred_df)
+        # the parsed row goes straight to the model, no DataFrame is built
+        results=serve_prediction(data.row, routed=True)
         
-        final_result = np.round((results[0]),2)[0]
+        final_result = np.round(results[0],2)
         
         return render_template('home.html',results=f"{final_result:.2f}")
+
+
+def invalid_form_message(error):
+    # FieldValidationError lists every bad field, not just the first one
+    return f"Error: Invalid input format. Please ensure all fields are numbers. Detail: {error}"
     
 
+@app.route('/api/v1/predict', methods=['POST'])
+def predict_batch():
+    try:
+        features = parse_features(request.mimetype, request.get_data(as_text=True),
+                                  max_rows=app.config['MAX_BATCH_ROWS'])
+    except ValueError as e:
+        # json.JSONDecodeError and pandas parser errors are ValueErrors too
+        return jsonify(error=str(e)), 400
+
+    preds = serve_prediction(features)
+    return jsonify(predictions=np.round(preds, 2).tolist(), count=int(len(preds)))
+
+
+@app.route('/api/v1/cache/stats')
+def cache_stats():
+    if not app.config['PREDICTION_CACHE']:
+        return jsonify(enabled=False)
+    return jsonify(enabled=True, **get_prediction_cache().stats())
+
+
+@app.route('/api/v1/batcher/stats')
+def batcher_stats():
+    if not app.config['MICRO_BATCHING']:
+        return jsonify(enabled=False)
+    return jsonify(enabled=True, **get_batcher().stats.as_dict())
+
+
+@app.route('/api/v1/registry')
+def registry_routing():
+    registry = PredictPipeline().registry
+    if not hasattr(registry, 'routing'):
+        return jsonify(versioned=False, model_version=PredictPipeline().model_version)
+    return jsonify(versioned=True, **registry.routing())
+
+
+@app.route('/readyz')
+def readyz():
+    # readiness probe: the first probe loads the models and runs a warm-up
+    # prediction, so the pod only reports ready once inference is hot
+    global _warmed_up
+    if not _warmed_up:
+        try:
+            warm_up()
+        except Exception as e:
+            return jsonify(ready=False, error=str(e)), 503
+        _warmed_up = True
+    return jsonify(ready=True, model_version=PredictPipeline().model_version)
+
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus text exposition format
+    if not instrumentation.is_enabled():
+        return Response("# metrics disabled, set AMES_METRICS=1\n", status=404, mimetype='text/plain')
+    return Response(instrumentation.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
 if __name__=="__main__":
+    warm_up()
+    _warmed_up = True
     app.run(host="0.0.0.0")        
@@ -0,0 +1,165 @@
+"""
+Production serving mode: ``uvicorn asgi:app --host 0.0.0.0 --port 8000``.
+
+Request I/O and parsing run on the event loop, inference for
+/api/v1/predict and /predictdata is dispatched to a bounded thread or
+process pool with preloaded models (503 once it is saturated), and
+everything else is served by the Flask app in application.py. Inference
+goes through the same serve_prediction as the Flask routes, so the
+AMES_PREDICTION_CACHE / AMES_MICRO_BATCHING settings apply here too (per
+worker process with AMES_EXECUTOR=process).
+
+Configured through the environment:
+    AMES_EXECUTOR          thread | process   (default thread)
+    AMES_EXECUTOR_WORKERS  pool size          (default 4)
+    AMES_MAX_PENDING       admitted requests before 503s (default 64)
+    AMES_DRAIN_TIMEOUT     seconds to drain on shutdown  (default 30)
+"""
+import os
+import json
+import asyncio
+from urllib.parse import parse_qs
+
+import numpy as np
+from asgiref.wsgi import WsgiToAsgi
+
+from application import app as flask_app, invalid_form_message, serve_prediction
+from src.models.input_record import HouseFeatures
+from src.models.predict_model import parse_features
+from src.instrumentation import span
+from src.models.inference_executor import (
+    InferenceExecutor,
+    InferenceExecutorConfig,
+    ServerOverloaded,
+)
+
+
+def executor_config_from_env():
+    return InferenceExecutorConfig(
+        kind=os.environ.get('AMES_EXECUTOR', 'thread'),
+        workers=int(os.environ.get('AMES_EXECUTOR_WORKERS', 4)),
+        max_pending=int(os.environ.get('AMES_MAX_PENDING', 64)),
+        drain_timeout=float(os.environ.get('AMES_DRAIN_TIMEOUT', 30)),
+    )
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ConnectionError("client disconnected")
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+async def send_response(send, status, body, content_type, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type.encode()),
+            (b'content-length', str(len(body)).encode()),
+            *headers,
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, status, payload, headers=()):
+    await send_response(send, status, json.dumps(payload).encode(), 'application/json', headers)
+
+
+class PredictionServer:
+
+    def __init__(self, wsgi_app, executor):
+        self.wsgi_app = wsgi_app
+        self.executor = executor
+        self._fallback = WsgiToAsgi(wsgi_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+
+        if scope['type'] == 'http':
+            route = (scope['method'], scope['path'])
+            if route == ('POST', '/api/v1/predict'):
+                return await self._predict_api(scope, receive, send)
+            if route == ('POST', '/predictdata'):
+                return await self._predict_form(scope, receive, send)
+            if route == ('GET', '/healthz'):
+                return await self._health(send)
+
+        await self._fallback(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    # model loading is blocking, keep it off the loop
+                    await asyncio.to_thread(self.executor.start)
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.executor.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _health(self, send):
+        status = 200 if self.executor.accepting else 503
+        await send_json(send, status, {'accepting': self.executor.accepting,
+                                       'pending': self.executor.pending})
+
+    async def _infer(self, send, features, routed=False):
+        # returns predictions, or None after having sent a 503
+        try:
+            return await self.executor.predict(features, routed=routed)
+        except ServerOverloaded as e:
+            await send_json(send, 503, {'error': f"overloaded: {e}"}, headers=[(b'retry-after', b'1')])
+            return None
+
+    async def _predict_api(self, scope, receive, send):
+        body = await read_body(receive)
+        headers = dict(scope['headers'])
+        content_type = headers.get(b'content-type', b'application/json').decode()
+        try:
+            features = parse_features(content_type, body.decode(),
+                                      max_rows=self.wsgi_app.config['MAX_BATCH_ROWS'])
+        except ValueError as e:
+            return await send_json(send, 400, {'error': str(e)})
+
+        preds = await self._infer(send, features)
+        if preds is not None:
+            await send_json(send, 200, {'predictions': np.round(preds, 2).tolist(),
+                                        'count': int(len(preds))})
+
+    async def _predict_form(self, scope, receive, send):
+        body = await read_body(receive)
+        form = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+        try:
+            with span("request_parse"):
+                features = HouseFeatures.parse(form).row
+            result = None
+        except ValueError as e:
+            features, result = None, invalid_form_message(e)
+
+        if features is not None:
+            preds = await self._infer(send, features, routed=True)
+            if preds is None:
+                return
+            result = f"{np.round(preds[0], 2):.2f}"
+
+        await send_response(send, 200, self._render_home(result).encode(), 'text/html; charset=utf-8')
+
+    def _render_home(self, results):
+        from flask import render_template
+
+        with self.wsgi_app.test_request_context('/predictdata'):
+            return render_template('home.html', results=results)
+
+
+app = PredictionServer(flask_app, InferenceExecutor(executor_config_from_env(), predict_fn=serve_prediction))
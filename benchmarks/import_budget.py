@@ -0,0 +1,63 @@
+"""
+Startup budget check for the serving entry points.
+
+    python -m benchmarks.import_budget                       # application, 800 ms
+    python -m benchmarks.import_budget --module asgi --budget-ms 900
+
+Imports the module in a fresh interpreter under ``python -X importtime``
+(best of --runs), and fails if the cumulative import time exceeds the
+budget or if a module that inference does not need at import time
+(sklearn, scipy, dill, pandas) shows up in the import graph.
+"""
+import re
+import sys
+import argparse
+import subprocess
+
+FORBIDDEN = ("sklearn", "scipy", "dill", "pandas")
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def measure(module="application"):
+    # (cumulative import time in ms, set of top-level packages imported)
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         capture_output=True, text=True, check=True)
+    total_us = None
+    packages = set()
+    for line in out.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        packages.add(name.split(".")[0])
+        if name == module and len(indent) == 1:
+            total_us = int(cumulative)
+    if total_us is None:
+        raise RuntimeError(f"no importtime entry for {module}")
+    return total_us / 1000.0, packages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.import_budget")
+    parser.add_argument("--module", default="application")
+    parser.add_argument("--budget-ms", type=float, default=800.0)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    results = [measure(args.module) for _ in range(args.runs)]
+    best_ms = min(ms for ms, _ in results)
+    forbidden = sorted(set(FORBIDDEN) & results[0][1])
+
+    print(f"import {args.module}: {best_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    failed = False
+    if best_ms > args.budget_ms:
+        print(f"FAIL: import time over budget by {best_ms - args.budget_ms:.1f} ms")
+        failed = True
+    if forbidden:
+        print(f"FAIL: {args.module} imports {', '.join(forbidden)} at startup")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
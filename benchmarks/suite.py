@@ -0,0 +1,298 @@
+"""
+Latency / throughput benchmarks for the serving and training paths.
+
+    python -m benchmarks.suite --output reports/benchmarks/latest.json
+    python -m benchmarks.suite --baseline reports/benchmarks/main.json --threshold 0.2
+
+Run from the project root (the serving benchmarks use models/*.pkl through
+the model registry). Every metric is a flat number in the output JSON so
+runs from different commits can be diffed; with --baseline the run exits
+non-zero if any metric regressed by more than --threshold.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src import load_object, save_frame
+from src.features.build_features import (
+    DataTransformation,
+    NUMERICAL_FEATURES,
+    TARGET_COLUMN,
+)
+from src.features.feature_spec import FORM_COLUMNS, FORM_FIELDS, compute_features, required_columns
+
+BATCH_SIZES = (1, 10, 100, 1000, 10000)
+UPSCALE_FACTORS = (10, 100)
+# metrics where a larger value is better; everything else is a cost
+HIGHER_IS_BETTER = ('_rps',)
+
+
+def _percentiles(samples, prefix):
+    samples = np.asarray(samples) * 1000.0
+    return {
+        f"{prefix}_p50_ms": float(np.percentile(samples, 50)),
+        f"{prefix}_p95_ms": float(np.percentile(samples, 95)),
+        f"{prefix}_p99_ms": float(np.percentile(samples, 99)),
+    }
+
+
+def _timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def load_features(data_path):
+    # the model inputs, their raw form inputs and the target derived from
+    # the raw Ames export
+    columns = list(dict.fromkeys(NUMERICAL_FEATURES + FORM_COLUMNS + [TARGET_COLUMN]))
+    df = pd.read_csv(data_path, usecols=required_columns(columns))
+    return compute_features(df, columns).reset_index(drop=True)
+
+
+def upscale(df, factor, seed=0):
+    # factor copies of the data with +-2% noise on the continuous columns,
+    # so the trees see distinct rows rather than exact duplicates
+    rng = np.random.default_rng(seed)
+    big = pd.concat([df] * factor, ignore_index=True)
+    for col in ('Gr Liv Area', 'Garage Area', '1st Flr SF', 'Total Bsmt SF', 'Lot Area', 'BsmtFin SF 1'):
+        big[col] = big[col] * rng.uniform(0.98, 1.02, len(big))
+    return big
+
+
+# --- startup ---------------------------------------------------------------
+
+def bench_startup():
+    from benchmarks.import_budget import measure
+
+    return {f"import_{module}_ms": measure(module)[0] for module in ("application", "asgi")}
+
+
+# --- (a) artifact cold load ---------------------------------------------
+
+def bench_load(model_path, preprocessor_path, repeat):
+    metrics = {}
+    for name, path in (("model", model_path), ("preprocessor", preprocessor_path)):
+        metrics.update(_percentiles(_timed(lambda: load_object(path), repeat), f"load_{name}"))
+
+    # first load in a fresh interpreter, including imports
+    code = ("import time; t = time.perf_counter(); from src import load_object; "
+            f"load_object({model_path!r}); load_object({preprocessor_path!r}); "
+            "print(time.perf_counter() - t)")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    metrics["load_fresh_process_ms"] = float(out.stdout.strip().splitlines()[-1]) * 1000.0
+    return metrics
+
+
+# --- (b) PredictPipeline latency ------------------------------------------
+
+def bench_predict(features, repeat):
+    from src.models.predict_model import PredictPipeline
+
+    pipeline = PredictPipeline()
+    pipeline.registry.preload()
+    metrics = {}
+    for batch_size in BATCH_SIZES:
+        batch = upscale(features, -(-batch_size // len(features)))[NUMERICAL_FEATURES].head(batch_size)
+        # fewer repeats for the big batches, they are stable anyway
+        n = max(5, repeat // max(1, batch_size // 100))
+        samples = _timed(lambda: pipeline.predict(batch), n)
+        metrics.update(_percentiles(samples, f"predict_batch{batch_size}"))
+        metrics[f"predict_batch{batch_size}_rps"] = batch_size / float(np.median(samples))
+    return metrics
+
+
+# --- (c) /predictdata through the Flask test client -------------------------
+
+def bench_http(features, n_requests):
+    from application import app
+
+    client = app.test_client()
+    rows = features[FORM_COLUMNS].fillna(0).head(n_requests).to_numpy()
+    forms = [{name: str(cast(value)) for (name, cast), value in zip(FORM_FIELDS, row)} for row in rows]
+
+    # warm-up loads the models
+    client.post('/predictdata', data=forms[0])
+    samples = []
+    start = time.perf_counter()
+    for i in range(n_requests):
+        form = forms[i % len(forms)]
+        t = time.perf_counter()
+        response = client.post('/predictdata', data=form)
+        samples.append(time.perf_counter() - t)
+        if response.status_code != 200:
+            raise RuntimeError(f"/predictdata returned {response.status_code}")
+    elapsed = time.perf_counter() - start
+
+    metrics = _percentiles(samples, "http_predictdata")
+    metrics["http_predictdata_rps"] = n_requests / elapsed
+    return metrics
+
+
+# --- (d) training path on upscaled data -----------------------------------
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _stage_worker(stage, work_dir, queue):
+    # runs in a fresh process so ru_maxrss is the stage's own peak
+    from src.models.train_model import modelTrainer
+
+    train_path = os.path.join(work_dir, 'train.parquet')
+    test_path = os.path.join(work_dir, 'test.parquet')
+    baseline_rss = _peak_rss_mb()
+    start = time.perf_counter()
+
+    if stage == 'transform':
+        transformation = DataTransformation()
+        transformation.data_transformation_config.preprocessor = os.path.join(work_dir, 'preprocessor.pkl')
+        train_arr, test_arr, _ = transformation.initiate_data_transform(train_path, test_path)
+        np.save(os.path.join(work_dir, 'train_arr.npy'), train_arr)
+        np.save(os.path.join(work_dir, 'test_arr.npy'), test_arr)
+    else:
+        train_arr = np.load(os.path.join(work_dir, 'train_arr.npy'))
+        test_arr = np.load(os.path.join(work_dir, 'test_arr.npy'))
+        start = time.perf_counter()
+        trainer = modelTrainer()
+        trainer.model_trainer_config.trainer_model_file_path = os.path.join(work_dir, 'model.pkl')
+        trainer.model_trainer_config.candidate_cache_dir = None
+        trainer.model_trainer_config.n_jobs = 1
+        trainer.initiate_model_trainer(train_array=train_arr, test_array=test_arr)
+
+    queue.put({
+        'wall_s': time.perf_counter() - start,
+        'peak_rss_mb': _peak_rss_mb(),
+        'import_rss_mb': baseline_rss,
+    })
+
+
+def _run_stage(stage, work_dir):
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_stage_worker, args=(stage, work_dir, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError(f"stage {stage} failed with exit code {process.exitcode}")
+    return result
+
+
+def bench_training(features, factors):
+    metrics = {}
+    for factor in factors:
+        with tempfile.TemporaryDirectory() as work_dir:
+            data = upscale(features, factor)
+            split = int(len(data) * 0.8)
+            save_frame(data.iloc[:split], os.path.join(work_dir, 'train.parquet'))
+            save_frame(data.iloc[split:], os.path.join(work_dir, 'test.parquet'))
+            del data
+
+            for stage in ('transform', 'train'):
+                result = _run_stage(stage, work_dir)
+                metrics[f"{stage}_x{factor}_wall_s"] = result['wall_s']
+                metrics[f"{stage}_x{factor}_peak_rss_mb"] = result['peak_rss_mb']
+    return metrics
+
+
+# --- reporting --------------------------------------------------------------
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(metrics, baseline, threshold):
+    # metric names that got worse than the baseline by more than threshold
+    regressions = []
+    for name, value in metrics.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if name.endswith(HIGHER_IS_BETTER):
+            change = (base - value) / base
+        else:
+            change = (value - base) / base
+        if change > threshold:
+            regressions.append((name, base, value, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    parser.add_argument("--data", default=os.path.join("notebooks", "data", "AmesHousing.csv"))
+    parser.add_argument("--model", default=os.path.join("models", "model.pkl"))
+    parser.add_argument("--preprocessor", default=os.path.join("models", "preprocessor.pkl"))
+    parser.add_argument("--output", default=os.path.join("reports", "benchmarks", "latest.json"))
+    parser.add_argument("--baseline", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed relative regression per metric (0.2 = 20%%)")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--scales", type=int, nargs="*", default=list(UPSCALE_FACTORS))
+    parser.add_argument("--only", nargs="*", choices=["startup", "load", "predict", "http", "training"],
+                        default=["startup", "load", "predict", "http", "training"])
+    args = parser.parse_args(argv)
+
+    features = load_features(args.data)
+    metrics = {}
+    if "startup" in args.only:
+        metrics.update(bench_startup())
+    if "load" in args.only:
+        metrics.update(bench_load(args.model, args.preprocessor, args.repeat))
+    if "predict" in args.only:
+        metrics.update(bench_predict(features, args.repeat))
+    if "http" in args.only:
+        metrics.update(bench_http(features, args.requests))
+    if "training" in args.only:
+        metrics.update(bench_training(features, args.scales))
+
+    result = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "metrics": metrics,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as file_obj:
+        json.dump(result, file_obj, indent=2)
+
+    for name, value in metrics.items():
+        print(f"{name:45s} {value:12.3f}")
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as file_obj:
+            baseline = json.load(file_obj)["metrics"]
+        regressions = compare(metrics, baseline, args.threshold)
+        for name, base, value, change in regressions:
+            print(f"REGRESSION {name}: {base:.3f} -> {value:.3f} ({change:+.0%})")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,38 +1,225 @@
 import os
 import sys
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-import pandas as pd
-import dill
-from sklearn.metrics import r2_score
+# pandas, dill and sklearn are imported where they are used: the serving
+# path imports this package but, with .npy artifacts, needs none of them
 from src.exception import CustomException
+from src.instrumentation import span
 
 
 def save_object(file_path, obj):
     try:
         dir_path = os.path.dirname(file_path)
         os.makedirs(dir_path, exist_ok = True)
-        with open(file_path, "wb") as file_obj:
-            dill.dump(obj, file_obj)
+        import dill
+
+        # write a temp file next to the target and rename it over, so a
+        # reader (e.g. the serving hot reload) never loads a partial pickle
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        try:
+            with span("artifact_save"), open(tmp_path, "wb") as file_obj:
+                dill.dump(obj, file_obj)
+                file_obj.flush()
+                os.fsync(file_obj.fileno())
+            os.replace(tmp_path, file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
     except Exception as e:
         raise CustomException(e,sys)
     
 
-def evaluate_model(x_train, y_train ,x_test , y_test , models ):
+def _reset_peak_rss():
+    # Linux lets a process reset its resident-set high-water mark, so a
+    # reused pool worker can report the peak of each fit on its own
+    try:
+        with open("/proc/self/clear_refs", "w") as file_obj:
+            file_obj.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    # high-water mark of this process's resident set: VmHWM where /proc has
+    # it (resettable, see _reset_peak_rss), else ru_maxrss (Linux reports KiB)
+    try:
+        with open("/proc/self/status") as file_obj:
+            for line in file_obj:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def candidate_cache_key(model, *arrays):
+    # hash of the training/testing data plus the estimator's class and
+    # hyperparameters, so a cached fit is reused only when nothing changed
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(str((array.dtype, array.shape)).encode())
+        digest.update(array.data)
+    digest.update(type(model).__qualname__.encode())
+    digest.update(repr(sorted(model.get_params(deep=True).items())).encode())
+    return digest.hexdigest()
+
+
+def _fit_candidate(model, x_train, y_train, x_test, y_test):
+    # runs in a pool worker (or inline when n_jobs == 1)
+    from sklearn.metrics import r2_score
+    from src.shared_arrays import open_shared
+
+    x_train, y_train, x_test, y_test = (open_shared(a) for a in (x_train, y_train, x_test, y_test))
+    rss_is_per_fit = _reset_peak_rss()
+    start = time.perf_counter()
+
+    with span("model_fit"):
+        model.fit(x_train, y_train)
+    train_model_score = r2_score(y_train, model.predict(x_train))
+    test_model_score = r2_score(y_test, model.predict(x_test))
+
+    fit_seconds = time.perf_counter() - start
+
+    return model, {
+        "train_score": train_model_score,
+        "test_score": test_model_score,
+        "wall_time_s": fit_seconds,
+        # resident-set high-water mark during this fit where the kernel
+        # allows resetting it (Linux), otherwise of the whole process so far
+        "peak_rss_mb": _peak_rss_mb(),
+        "peak_rss_per_fit": rss_is_per_fit,
+    }
+
+
+def measure_serving(model, x_sample, n_calls=2000, engine="sklearn"):
+    # per-row latency of a fitted model (n_calls single-row predicts cycling
+    # through the sample rows, model only: the rows are already transformed)
+    # and the size of its pickled artifact. engine='sklearn' times
+    # model.predict, i.e. the pickled model as save_object ships it;
+    # 'compiled' times forests on the pure-NumPy CompiledForest instead
+    # (models it cannot compile fall back to model.predict)
+    import dill
+
+    predict, used_engine = model.predict, "sklearn"
+    if engine == "compiled":
+        from src.models.compiled_model import CompiledForest
+        try:
+            predict, used_engine = CompiledForest.from_sklearn(model).predict, "compiled"
+        except ValueError:
+            pass
+
+    rows = np.asarray(x_sample, dtype=np.float64)
+    for i in range(min(len(rows), 20)):
+        predict(rows[i:i + 1])
+    timings = np.empty(n_calls)
+    for i in range(n_calls):
+        row = i % len(rows)
+        start = time.perf_counter()
+        predict(rows[row:row + 1])
+        timings[i] = time.perf_counter() - start
+
+    return {
+        "row_p50_ms": float(np.percentile(timings, 50) * 1000),
+        "row_p95_ms": float(np.percentile(timings, 95) * 1000),
+        "row_p99_ms": float(np.percentile(timings, 99) * 1000),
+        "artifact_mb": len(dill.dumps(model)) / (1024 * 1024),
+        "engine": used_engine,
+    }
+
+
+def _limit_inner_jobs(model, n_workers):
+    # share the cores between pool workers and the estimator's own n_jobs
+    # (e.g. RandomForest) instead of running workers x cores threads; the
+    # limit is set on an unfitted clone so the caller's estimator keeps its value
+    if "n_jobs" not in model.get_params():
+        return model
+    from sklearn.base import clone
+
+    return clone(model).set_params(n_jobs=max(1, (os.cpu_count() or 1) // n_workers))
+
+
+def evaluate_model(x_train, y_train ,x_test , y_test , models, n_jobs=1, cache_dir=None, return_details=False,
+                   serving_calls=None, serving_engine="sklearn"):
+    """
+    Fits every candidate in ``models`` and returns {name: test r2 score}.
+
+    With ``n_jobs`` > 1 (or -1 for all cores) candidates are fitted in
+    parallel on a pool of reused worker processes. With ``cache_dir`` fitted
+    candidates are stored keyed on data hash + hyperparameters and reused
+    on reruns. The fitted estimators replace the entries of ``models``.
+    With ``return_details`` a second dict with train score, wall time and
+    peak memory per candidate is returned as well. With ``serving_calls``
+    the details also hold each candidate's per-row latency and artifact
+    size (see measure_serving), measured one candidate at a time in this
+    process so parallel fits do not skew the timings.
+    """
     try:
         report = {}
-        
-        for i in range (len(models)):
-            model = list(models.values())[i]
-            
-            model.fit(x_train, y_train)
-            y_train_pred = model.predict(x_train)
-            y_test_pred = model.predict(x_test)
-            
-            train_model_score  = r2_score(y_train, y_train_pred)
-            test_model_score = r2_score(y_test, y_test_pred)
-            
-            report[list(models.keys())[i]] = test_model_score
-            
+        details = {}
+        pending = {}
+
+        for name, model in models.items():
+            key = None
+            if cache_dir:
+                key = candidate_cache_key(model, x_train, y_train, x_test, y_test)
+                cache_path = os.path.join(cache_dir, f"{key}.pkl")
+                if os.path.exists(cache_path):
+                    models[name], details[name] = load_object(cache_path)
+                    details[name] = dict(details[name], cached=True)
+                    continue
+            pending[name] = key
+
+        if n_jobs == -1:
+            n_jobs = os.cpu_count() or 1
+        n_workers = max(1, min(n_jobs, len(pending)))
+
+        if n_workers == 1:
+            fitted = {
+                name: _fit_candidate(models[name], x_train, y_train, x_test, y_test)
+                for name in pending
+            }
+        else:
+            from src.shared_arrays import share_arrays
+
+            # workers get handles to one shared copy of the data instead of
+            # a pickled copy of every array per candidate
+            with share_arrays(x_train, y_train, x_test, y_test) as shared, \
+                    ProcessPoolExecutor(max_workers=n_workers) as pool:
+                futures = {
+                    name: pool.submit(_fit_candidate, _limit_inner_jobs(models[name], n_workers), *shared)
+                    for name in pending
+                }
+                fitted = {name: future.result() for name, future in futures.items()}
+
+        for name, (model, detail) in fitted.items():
+            if "n_jobs" in model.get_params():
+                # the fitted copy ran with the pool's share of the cores
+                model.set_params(n_jobs=models[name].get_params()["n_jobs"])
+            models[name] = model
+            details[name] = dict(detail, cached=False)
+            if cache_dir:
+                save_object(os.path.join(cache_dir, f"{pending[name]}.pkl"), (model, detail))
+
+        if serving_calls:
+            for name in models:
+                details[name].update(measure_serving(models[name], x_test, serving_calls, serving_engine))
+
+        # keep the caller's candidate order
+        for name in models:
+            report[name] = details[name]["test_score"]
+
+        if return_details:
+            return report, details
         return report
     except Exception as e:
         raise CustomException(e,sys)
@@ -40,7 +227,76 @@ def evaluate_model(x_train, y_train ,x_test , y_test , models ):
     
 def load_object(file_path):
     try:
-        with open(file_path,"rb") as file_obj:
+        if os.path.isdir(file_path):
+            # pickle-free .npy directory written by save_array_artifact
+            from src.models.compiled_model import load_array_artifact
+            with span("artifact_load"):
+                return load_array_artifact(file_path)
+
+        import dill
+
+        with span("artifact_load"), open(file_path,"rb") as file_obj:
             return dill.load(file_obj)
     except Exception as e:
-        raise CustomException(e,sys)
\ No newline at end of file
+        raise CustomException(e,sys)
+
+
+def save_frame(df, file_path, dtypes=None):
+    # parquet/feather (by extension) keep column types, so readers skip
+    # re-parsing and type inference; anything else is written as CSV
+    try:
+        dir_path = os.path.dirname(file_path)
+        os.makedirs(dir_path, exist_ok = True)
+        if dtypes:
+            df = df.astype({col: dtype for col, dtype in dtypes.items() if col in df.columns})
+
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext in (".parquet", ".pq"):
+            df.to_parquet(file_path, index=False)
+        elif ext == ".feather":
+            df.reset_index(drop=True).to_feather(file_path)
+        else:
+            df.to_csv(file_path, index=False, header=True)
+    except Exception as e:
+        raise CustomException(e,sys)
+
+
+def load_frame(file_path, columns=None, dtypes=None):
+    # reads only `columns` (in that order) when given; columnar formats do
+    # this without touching the other columns on disk
+    import pandas as pd
+
+    try:
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext in (".parquet", ".pq"):
+            df = pd.read_parquet(file_path, columns=columns)
+        elif ext == ".feather":
+            df = pd.read_feather(file_path, columns=columns)
+        else:
+            df = pd.read_csv(file_path, usecols=columns, dtype=dtypes)
+            if columns is not None:
+                df = df[columns]
+        return df
+    except Exception as e:
+        raise CustomException(e,sys)
+
+
+def iter_frame_chunks(file_path, chunk_size, columns=None):
+    # yields DataFrames of at most chunk_size rows, reading only `columns`;
+    # parquet is streamed by row group batches and CSV by pandas' chunked
+    # reader, so the whole file is never in memory
+    import pandas as pd
+
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in (".parquet", ".pq"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    elif ext == ".feather":
+        df = pd.read_feather(file_path, columns=columns)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+    else:
+        for chunk in pd.read_csv(file_path, usecols=columns, chunksize=chunk_size):
+            yield chunk if columns is None else chunk[columns]
@@ -1,55 +1,79 @@
 # -*- coding: utf-8 -*-
 import os
 import sys
+import argparse
+from dataclasses import asdict
 from src.exception import CustomException
 from src.logger import logging
+from src import instrumentation
+from src.instrumentation import span
 import pandas as pd
 import numpy as np
 from dataclasses import dataclass
 from src.features.build_features import DataTransformationConfig
-from src.features.build_features import DataTransformation
-from src.models.train_model import modelTrainer
+from src.features.build_features import DataTransformation, INTERIM_DTYPES
+from src.features import feature_spec
+from src.models.train_model import modelTrainer, SuccessiveHalvingSearch
+from src.data.stage_cache import StageCache
+from src.models.model_registry import publish_version
+from src.models.incremental import IncrementalTrainer, IncrementalTrainerConfig
+from src.models.cross_validation import cross_validate, stratified_fold_indices
+from src import evaluate_model, measure_serving, save_frame, load_frame
 
 
 @dataclass
 class DataIngestionConfig:
-    train_data_path:str = os.path.join('../../data/interim', 'train.csv')
-    test_data_path:str = os.path.join('../../data/interim', 'test.csv')
-    raw_data_path:str = os.path.join('../../data/raw','raw_data.csv')
-    log_data_path:str = os.path.join('../../data/interim','Log_Transformed_Features.csv')
+    # interim layer is parquet (typed, columnar); a .csv path still works
+    train_data_path:str = os.path.join('../../data/interim', 'train.parquet')
+    test_data_path:str = os.path.join('../../data/interim', 'test.parquet')
+    raw_data_path:str = os.path.join('../../data/raw','raw_data.parquet')
+    log_data_path:str = os.path.join('../../data/interim','Log_Transformed_Features.parquet')
+    source_data_path:str = os.path.join('../../data/raw','AmesHousing.csv')
     
 class DataIngestion:
     def __init__(self):
         self.ingestion_config = DataIngestionConfig()
 
-            
-    def initiate_data_ingestion(self):
-        logging.info("Entered the data ingestion method or component")
+    def ingest_raw_data(self):
+        # --- 1. Data Ingestion (Read and Save Raw Data) ---
+        with span("csv_read"):
+            df = pd.read_csv(self.ingestion_config.source_data_path)
+        logging.info('Read the dataset as data frame')
 
-        try:
-            # --- 1. Data Ingestion (Read and Save Raw Data) ---
-            df = pd.read_csv('../../data/raw/AmesHousing.csv')
-            logging.info('Read the dataset as data frame')
-
-            os.makedirs(os.path.dirname(self.ingestion_config.raw_data_path), exist_ok=True)
-            df.to_csv(self.ingestion_config.raw_data_path, index=False, header=True)
+        save_frame(df, self.ingestion_config.raw_data_path)
+        return df
 
+    def split_data(self, df):
+        try:
             # --- 2. Data Transformation (Split and Log-Transform Data) ---
             Data_Transformation = DataTransformation()
             
             # This calls the transformation logic and gets the split DataFrames
-            train_data, test_data, log_transormed_df = Data_Transformation.basic_data_transformation(df)
+            with span("basic_data_transformation"):
+                train_data, test_data, log_transormed_df = Data_Transformation.basic_data_transformation(df)
 
             # --- 3. Save Split Data ---
-            # Ensure the directory for train/test data exists
-            os.makedirs(os.path.dirname(self.ingestion_config.train_data_path), exist_ok=True)
-
-            test_data.to_csv(self.ingestion_config.test_data_path, index=False, header=True)
-            train_data.to_csv(self.ingestion_config.train_data_path, index=False, header=True)
-            log_transormed_df.to_csv(self.ingestion_config.log_data_path, index=False, header=True)
+            save_frame(test_data, self.ingestion_config.test_data_path, dtypes=INTERIM_DTYPES)
+            save_frame(train_data, self.ingestion_config.train_data_path, dtypes=INTERIM_DTYPES)
+            save_frame(log_transormed_df, self.ingestion_config.log_data_path, dtypes=INTERIM_DTYPES)
 
             logging.info('Ingestion and initial transformation (split) of the data is completed')
 
+            return (
+                self.ingestion_config.train_data_path,
+                self.ingestion_config.test_data_path
+            )
+
+        except Exception as e:
+            raise CustomException(e,sys)
+            
+    def initiate_data_ingestion(self):
+        logging.info("Entered the data ingestion method or component")
+
+        try:
+            df = self.ingest_raw_data()
+            self.split_data(df)
+
             # --- 4. Return Paths (The Fix for the previous error) ---
             # This returns the paths to the saved train and test data, 
             # which will be unpacked by the calling function.
@@ -62,13 +86,171 @@ class DataIngestion:
             raise CustomException(e,sys)
             
 
-if __name__ == "__main__":
-    obj = DataIngestion()
-    train_data, test_data = obj.initiate_data_ingestion()
-    
+@dataclass
+class PipelineCacheConfig:
+    manifest_path:str = os.path.join('../../data/interim', 'stage_cache.json')
+    # transformed arrays handed from the preprocessing stage to training
+    x_train_path:str = os.path.join('../../data/processed', 'x_train.npy')
+    y_train_path:str = os.path.join('../../data/processed', 'y_train.npy')
+    x_test_path:str = os.path.join('../../data/processed', 'x_test.npy')
+    y_test_path:str = os.path.join('../../data/processed', 'y_test.npy')
+
+    @property
+    def array_paths(self):
+        return [self.x_train_path, self.y_train_path, self.x_test_path, self.y_test_path]
+
+
+def run_pipeline(force=False, out_of_core=False, cv_folds=None, max_row_p95_ms=None, max_artifact_mb=None):
+    """
+    Ingestion -> split -> preprocessor fit -> model training, where each
+    stage reruns only if its inputs, config or code changed since the
+    outputs on disk were produced (see StageCache).
+    """
+    cache_config = PipelineCacheConfig()
+    cache = StageCache(cache_config.manifest_path, force=force)
+
+    ingestion = DataIngestion()
+    ingestion_config = ingestion.ingestion_config
     data_transformation = DataTransformation()
-    train_arr, test_arr,_= data_transformation.initiate_data_transform(train_data, test_data)
-    
+    data_transformation.data_transformation_config.out_of_core = out_of_core
     modeltrainer = modelTrainer()
-    # print(train_arr)
-    print(modeltrainer.initiate_model_trainer(train_array = train_arr,test_array = test_arr))
\ No newline at end of file
+    if cv_folds:
+        modeltrainer.model_trainer_config.cv.enabled = True
+        modeltrainer.model_trainer_config.cv.n_splits = cv_folds
+    budget = modeltrainer.model_trainer_config.budget
+    if max_row_p95_ms is not None or max_artifact_mb is not None:
+        budget.enabled = True
+        budget.max_row_p95_ms = budget.max_row_p95_ms if max_row_p95_ms is None else max_row_p95_ms
+        budget.max_artifact_mb = budget.max_artifact_mb if max_artifact_mb is None else max_artifact_mb
+
+    # every stage from the split on depends on which features are selected
+    # and how they are computed: the module source covers edits to the
+    # Feature formulas and the feature lists, the params the feature set
+    # picked at run time (AMES_FEATURE_SET)
+    spec_params = {"feature_set": feature_spec.FEATURE_SET, "model_features": feature_spec.MODEL_FEATURES}
+
+    def ingest():
+        ingestion.ingest_raw_data()
+
+    def split():
+        ingestion.split_data(load_frame(ingestion_config.raw_data_path))
+
+    cache.run(
+        "ingestion", ingest,
+        input_paths=[ingestion_config.source_data_path],
+        output_paths=[ingestion_config.raw_data_path],
+        code=[DataIngestion.ingest_raw_data],
+    )
+
+    cache.run(
+        "basic_data_transformation", split,
+        input_paths=[ingestion_config.raw_data_path],
+        output_paths=[ingestion_config.train_data_path, ingestion_config.test_data_path,
+                      ingestion_config.log_data_path],
+        params=spec_params,
+        code=[DataIngestion.split_data, DataTransformation.basic_data_transformation, feature_spec],
+    )
+
+    def fit_preprocessor():
+        arrays = data_transformation.transform_features(
+            ingestion_config.train_data_path, ingestion_config.test_data_path)
+        os.makedirs(os.path.dirname(cache_config.x_train_path), exist_ok=True)
+        for path, array in zip(cache_config.array_paths, arrays):
+            np.save(path, array)
+
+    cache.run(
+        "preprocessing", fit_preprocessor,
+        input_paths=[ingestion_config.train_data_path, ingestion_config.test_data_path],
+        output_paths=[data_transformation.data_transformation_config.preprocessor,
+                      *cache_config.array_paths],
+        params={**asdict(data_transformation.data_transformation_config), **spec_params},
+        code=[feature_spec,
+              DataTransformation.get_data_transformer_object,
+              DataTransformation.transform_features,
+              DataTransformation._transform_into,
+              DataTransformation._transform_features_out_of_core,
+              DataTransformation._transform_file],
+    )
+
+    def train():
+        # memory-mapped, so the feature matrices are not copied into the heap
+        x_train, y_train, x_test, y_test = (
+            np.load(path, mmap_mode='r') for path in cache_config.array_paths)
+        r2_Score, _ = modeltrainer.train_model(x_train, y_train, x_test, y_test)
+        result = {"r2_score": float(r2_Score)}
+        if modeltrainer.cv_report:
+            result["cv_r2"] = {name: report["mean"] for name, report in modeltrainer.cv_report.items()}
+        if modeltrainer.budget_report:
+            selected = modeltrainer.budget_report["selected"]
+            point = next(p for p in modeltrainer.budget_report["curve"] if p["model"] == selected)
+            result["serving"] = {key: point[key] for key in ("model", "row_p95_ms", "artifact_mb")}
+
+        trainer_config = modeltrainer.model_trainer_config
+        if trainer_config.registry_dir:
+            # a new immutable version instead of only overwriting model.pkl
+            result["registry_version"] = publish_version(
+                trainer_config.registry_dir,
+                trainer_config.trainer_model_file_path,
+                data_transformation.data_transformation_config.preprocessor,
+                metrics={"r2_score": result["r2_score"]},
+                activate=trainer_config.activate_new_version,
+                keep=trainer_config.keep_versions,
+            )
+        return result
+
+    result = cache.run(
+        "model_training", train,
+        input_paths=cache_config.array_paths,
+        output_paths=[modeltrainer.model_trainer_config.trainer_model_file_path],
+        params={**asdict(modeltrainer.model_trainer_config), **spec_params},
+        code=[feature_spec, modelTrainer.train_model, modelTrainer._select_within_budget, SuccessiveHalvingSearch,
+              evaluate_model, measure_serving, cross_validate, stratified_fold_indices],
+    )
+
+    logging.info(f"pipeline stages run: {cache.ran}, skipped: {cache.skipped}")
+    return result, cache
+
+
+def run_incremental(new_data_path):
+    # daily refresh of the existing model with newly arrived sales
+    ingestion_config = DataIngestionConfig()
+    trainer_config = modelTrainer().model_trainer_config
+    test_df = load_frame(ingestion_config.test_data_path) if os.path.exists(ingestion_config.test_data_path) else None
+
+    trainer = IncrementalTrainer(IncrementalTrainerConfig(
+        registry_dir=trainer_config.registry_dir,
+        activate_new_version=trainer_config.activate_new_version,
+        keep_versions=trainer_config.keep_versions,
+    ))
+    return trainer.refresh(load_frame(new_data_path), test_df=test_df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="build the dataset, preprocessor and model")
+    parser.add_argument("--force", action="store_true",
+                        help="rerun every stage even if its cached outputs are up to date")
+    parser.add_argument("--no-timings", action="store_true",
+                        help="skip the per-stage timing summary")
+    parser.add_argument("--increment", default=None, metavar="PATH",
+                        help="refresh the trained model with new sales rows instead of rebuilding")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="fit the preprocessor from streamed chunks of the training split")
+    parser.add_argument("--cv-folds", type=int, default=None, metavar="K",
+                        help="pick the model by stratified K-fold cross-validation on the training split")
+    parser.add_argument("--max-row-p95-ms", type=float, default=None,
+                        help="serving budget: per-row p95 latency of the selected model")
+    parser.add_argument("--max-artifact-mb", type=float, default=None,
+                        help="serving budget: size of the saved model artifact")
+    args, _ = parser.parse_known_args()
+
+    if not args.no_timings:
+        instrumentation.enable()
+    if args.increment:
+        print(run_incremental(args.increment))
+    else:
+        result, cache = run_pipeline(force=args.force, out_of_core=args.out_of_core, cv_folds=args.cv_folds,
+                                     max_row_p95_ms=args.max_row_p95_ms, max_artifact_mb=args.max_artifact_mb)
+        print(f"stages run: {cache.ran or 'none'}, skipped: {cache.skipped or 'none'}")
+        print(result)
+    if not args.no_timings:
+        print(instrumentation.summary())
@@ -0,0 +1,82 @@
+import os
+import sys
+import json
+import inspect
+import hashlib
+
+from src.exception import CustomException
+from src.logger import logging
+from src.instrumentation import span
+from src.models.model_registry import file_digest
+
+
+def stage_key(input_paths, params, code):
+    # hash of everything a stage depends on: input file contents, its
+    # config and the source of the functions (or modules) that implement it
+    digest = hashlib.sha256()
+    for path in input_paths:
+        digest.update(path.encode())
+        digest.update(file_digest(path).encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    for func in code:
+        digest.update(inspect.getsource(func).encode())
+    return digest.hexdigest()
+
+
+class StageCache:
+    """
+    Records, per pipeline stage, the key its outputs were produced from and
+    the digests of those outputs. A stage is rerun only when its key changed
+    or an output is missing or was modified since; ``force`` reruns all.
+    """
+
+    def __init__(self, manifest_path, force=False):
+        self.manifest_path = manifest_path
+        self.force = force
+        self.manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as file_obj:
+                self.manifest = json.load(file_obj)
+        self.ran = []
+        self.skipped = []
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as file_obj:
+            json.dump(self.manifest, file_obj, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _is_fresh(self, name, key, output_paths):
+        entry = self.manifest.get(name)
+        if self.force or entry is None or entry["key"] != key:
+            return False
+        for path in output_paths:
+            if not os.path.exists(path) or file_digest(path) != entry["outputs"].get(path):
+                return False
+        return True
+
+    def run(self, name, func, input_paths=(), output_paths=(), params=None, code=()):
+        # returns func()'s (JSON-serialisable) result, or the recorded one
+        # when the stage is still up to date
+        try:
+            key = stage_key(input_paths, params, code)
+            if self._is_fresh(name, key, output_paths):
+                logging.info(f"stage {name} is up to date, skipping")
+                self.skipped.append(name)
+                return self.manifest[name]["result"]
+
+            logging.info(f"running stage {name}")
+            with span(f"pipeline_{name}"):
+                result = func()
+            self.manifest[name] = {
+                "key": key,
+                "outputs": {path: file_digest(path) for path in output_paths},
+                "result": result,
+            }
+            self._save()
+            self.ran.append(name)
+            return result
+
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -10,11 +10,27 @@ from sklearn.pipeline import Pipeline
 from sklearn.model_selection import StratifiedShuffleSplit
 from src.exception import CustomException
 from dataclasses import dataclass
-from src import save_object
+from src import save_object, load_frame, iter_frame_chunks
+from src.instrumentation import span
+from src.features.feature_spec import TARGET_COLUMN, MODEL_FEATURES, compute_features
+
+NUMERICAL_FEATURES = MODEL_FEATURES
+
+# explicit column types of the interim train/test layer
+INTERIM_DTYPES = {
+    **{col: 'float64' for col in NUMERICAL_FEATURES},
+    TARGET_COLUMN: 'int64',
+    'Log_SalePrice': 'float64',
+}
 
 @dataclass
 class DataTransformationConfig:
     preprocessor:str = os.path.join('../../models', 'preprocessor.pkl')
+    # fit the preprocessor from streamed chunks instead of loading the
+    # splits into memory (for exports larger than RAM), see streaming_stats
+    out_of_core: bool = False
+    chunk_size: int = 100000
+    sketch_size: int = 2048
     
 class DataTransformation:
     def __init__(self):
@@ -23,16 +39,10 @@ class DataTransformation:
     def get_data_transformer_object(self):
         try:
             
-            # 1. Load your dataset
-           # NEW (Correct path: go up one level, then into 'data')
-            df = pd.read_csv('../../data/interim/train.csv')
-
-            TARGET_COLUMN = 'SalePrice' 
-
-            X = df.drop(columns=[TARGET_COLUMN])
-            
             # Identify Numerical and Categorical Columns
-            numerical_features = ['Overall Qual', 'Gr Liv Area', 'Garage Cars', 'Garage Area', '1st Flr SF', 'Total Bsmt SF', 'Lot Area', 'BsmtFin SF 1', 'Full Bath', 'year_since_remod']
+            # (the transformer is built from the column list alone, the
+            # training data is only needed when it is fitted)
+            numerical_features = NUMERICAL_FEATURES
             # log_columns = ['Gr Liv Area', '1st Flr SF','BsmtFin SF 1']
             # normal_numerical_features = list(set(numerical_features) - set(log_columns))
 
@@ -72,10 +82,9 @@ class DataTransformation:
             logging.info("basic data transformation begin")
             # here the necessary adjustment is done to get the better results
             
-            df['year_since_remod'] = df['Yr Sold'] - df['Year Remod/Add']
-            df['Log_SalePrice'] = np.log1p(df['SalePrice'])
-                        
-            df1 = df[['Overall Qual', 'Gr Liv Area', 'Garage Cars', 'Garage Area', '1st Flr SF', 'Total Bsmt SF', 'Lot Area', 'BsmtFin SF 1', 'Full Bath', 'year_since_remod','SalePrice','Log_SalePrice']].copy()
+            # derived columns come from the feature spec; only the ones
+            # the model uses (plus the log target for stratifying) are built
+            df1 = compute_features(df, NUMERICAL_FEATURES + [TARGET_COLUMN, 'Log_SalePrice'])
            
                
             # Splitting data through Stratified Shuffle Split using sale_pric_cat as target
@@ -84,8 +93,9 @@ class DataTransformation:
             df1['Sale_price_cat'] = pd.cut(df1['Log_SalePrice'],bins = [9.4550,11.7280,11.8590,12.0910,12.3460, np.inf],labels = [1,2,3,4,5])
             split = StratifiedShuffleSplit(n_splits = 1, test_size=0.2, random_state=42)
             for train_index, test_index in split.split(df1,df1['Sale_price_cat']):
-                train_data = df1.loc[test_index].drop(columns = ['Sale_price_cat', 'Log_SalePrice'])
-                test_data = df1.loc[train_index].drop(columns = ['Sale_price_cat', 'Log_SalePrice'])
+                # positional indices: the 80% side is the training data
+                train_data = df1.iloc[train_index].drop(columns = ['Sale_price_cat', 'Log_SalePrice'])
+                test_data = df1.iloc[test_index].drop(columns = ['Sale_price_cat', 'Log_SalePrice'])
                 
                 
                 
@@ -96,43 +106,122 @@ class DataTransformation:
         except Exception as e:
             raise CustomException(e,sys)
 
-    def initiate_data_transform(self, train_path, test_path):
+    def transform_features(self, train_path, test_path, dtype = np.float32, out = None, chunk_size = 65536):
+        """
+        Fits the preprocessor on the training split and returns
+        ``(x_train, y_train, x_test, y_test)`` as separate C-contiguous
+        arrays, so the trainer can use them without slicing a combined
+        matrix. ``out`` may hold preallocated ``(x_train, x_test)`` buffers
+        of shape (n_rows, n_features); transformed rows are written into
+        them chunk by chunk, so no full-size float64 temporary is built.
+        float32 is the default because that is what the tree models
+        convert their input to anyway.
+        """
         try:
-            train_df = pd.read_csv(train_path)
-            test_df = pd.read_csv(test_path)
-                
+            if self.data_transformation_config.out_of_core:
+                return self._transform_features_out_of_core(train_path, test_path, dtype, out)
+
+            # only the model inputs and the target are read back
+            columns = NUMERICAL_FEATURES + [TARGET_COLUMN]
+            train_df = load_frame(train_path, columns = columns, dtypes = INTERIM_DTYPES)
+            test_df = load_frame(test_path, columns = columns, dtypes = INTERIM_DTYPES)
             logging.info("read train and test data is completed")
-                
-            logging.info("obtaining preprocessing object")
-                
+
             preprocessing_obj = self.get_data_transformer_object()
-            
-            target_column_name = "SalePrice"
-            
-            input_feature_train_df = train_df.drop(columns = [target_column_name])
-            target_feature_train_df = train_df[target_column_name]
-            
-            input_feature_test_df = test_df.drop(columns = [target_column_name], axis = 1)
-            target_feature_test_df = test_df[target_column_name]
-            
-            logging.info(f"Applying preprocessing object on training dataframe and testing data frame")
-            
-            input_feature_train_arr = preprocessing_obj.fit_transform(input_feature_train_df)
-            input_feature_test_arr = preprocessing_obj.transform(input_feature_test_df)
-            
-            train_arr = np.c_[
-                input_feature_train_arr, np.array(target_feature_train_df)
-            ]
-            test_arr = np.c_[
-                input_feature_test_arr, np.array(target_feature_test_df)
-            ]
-            logging.info(f"Saved preprocessing object.")
+
+            # the ColumnTransformer selects the feature columns itself, so
+            # the target never has to be dropped (copied) out of the frame
+            with span("preprocessor_fit"):
+                preprocessing_obj.fit(train_df)
+
+            x_train_out, x_test_out = out if out is not None else (None, None)
+            x_train = self._transform_into(preprocessing_obj, train_df, x_train_out, dtype, chunk_size)
+            x_test = self._transform_into(preprocessing_obj, test_df, x_test_out, dtype, chunk_size)
+            y_train = train_df[TARGET_COLUMN].to_numpy(dtype = np.float64)
+            y_test = test_df[TARGET_COLUMN].to_numpy(dtype = np.float64)
+
             save_object(file_path = self.data_transformation_config.preprocessor,obj = preprocessing_obj)
-            
+            logging.info(f"Saved preprocessing object.")
+
+            return x_train, y_train, x_test, y_test
+
+        except Exception as e:
+            raise CustomException(e,sys)
+
+    def share_transformed_features(self, train_path, test_path, owner):
+        # transform_features with the four arrays handed to `owner` (a
+        # src.shared_arrays.SharedArrays); returns their SharedArray handles,
+        # and the heap copies are dropped on return
+        return tuple(owner.share(array) for array in self.transform_features(train_path, test_path))
+
+    def _transform_features_out_of_core(self, train_path, test_path, dtype, out):
+        # imported here: streaming_stats builds on this module
+        from src.features.streaming_stats import fit_preprocessor_out_of_core
+
+        config = self.data_transformation_config
+        with span("preprocessor_fit"):
+            preprocessing_obj, _ = fit_preprocessor_out_of_core(
+                train_path, chunk_size = config.chunk_size, sketch_size = config.sketch_size)
+
+        x_train_out, x_test_out = out if out is not None else (None, None)
+        x_train, y_train = self._transform_file(preprocessing_obj, train_path, x_train_out, dtype, config.chunk_size)
+        x_test, y_test = self._transform_file(preprocessing_obj, test_path, x_test_out, dtype, config.chunk_size)
+
+        save_object(file_path = config.preprocessor, obj = preprocessing_obj)
+        logging.info("Saved out-of-core preprocessing object.")
+        return x_train, y_train, x_test, y_test
+
+    @staticmethod
+    def _transform_file(preprocessor, path, out, dtype, chunk_size):
+        # second pass over the file: only one chunk of raw rows is held at a time
+        x_parts, y_parts, offset = [], [], 0
+        for chunk in iter_frame_chunks(path, chunk_size, NUMERICAL_FEATURES + [TARGET_COLUMN]):
+            with span("preprocessor_transform"):
+                x_chunk = preprocessor.transform(chunk)
+            if out is None:
+                x_parts.append(x_chunk.astype(dtype, copy = False))
+            elif offset + len(chunk) > len(out):
+                raise ValueError(f"output buffer holds {len(out)} rows, {path} has more")
+            else:
+                out[offset:offset + len(chunk)] = x_chunk
+            y_parts.append(chunk[TARGET_COLUMN].to_numpy(dtype = np.float64))
+            offset += len(chunk)
+
+        if out is not None and offset != len(out):
+            raise ValueError(f"output buffer holds {len(out)} rows, {path} has {offset}")
+        n_features = len(NUMERICAL_FEATURES)
+        x = out if out is not None else np.ascontiguousarray(
+            np.concatenate(x_parts) if x_parts else np.empty((0, n_features), dtype = dtype))
+        y = np.concatenate(y_parts) if y_parts else np.empty(0)
+        return x, y
+
+    @staticmethod
+    def _transform_into(preprocessor, df, out, dtype, chunk_size):
+        n_rows = len(df)
+        n_features = len(NUMERICAL_FEATURES)
+        if out is None:
+            out = np.empty((n_rows, n_features), dtype = dtype, order = 'C')
+        elif out.shape != (n_rows, n_features) or not out.flags.c_contiguous:
+            raise ValueError(f"output buffer must be C-contiguous with shape {(n_rows, n_features)}, got {out.shape}")
+
+        for start in range(0, n_rows, chunk_size):
+            stop = min(start + chunk_size, n_rows)
+            with span("preprocessor_transform"):
+                out[start:stop] = preprocessor.transform(df.iloc[start:stop])
+        return out
+
+    def initiate_data_transform(self, train_path, test_path):
+        # kept for callers that expect the target stacked as the last column
+        try:
+            x_train, y_train, x_test, y_test = self.transform_features(train_path, test_path, dtype = np.float64)
+
+            train_arr = np.c_[x_train, y_train]
+            test_arr = np.c_[x_test, y_test]
+
             return(
                 train_arr,
                 test_arr,
                 self.data_transformation_config.preprocessor
             )
         except Exception as e:
-            raise CustomException(e,sys)
\ No newline at end of file
+            raise CustomException(e,sys)
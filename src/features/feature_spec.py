@@ -0,0 +1,150 @@
+import os
+import re
+from dataclasses import dataclass
+
+import numpy as np
+
+# Single declaration of every model input and derived column. Training
+# (basic_data_transformation, the preprocessor), serving (PredictPipeline,
+# CustomData, HouseFeatures) and the incremental trainer all take their
+# column lists and derived-column formulas from here. Only numpy is
+# imported, so the serving path can use it without pandas/sklearn import
+# cost. (feature_extraction.py at the repo root checks a fitted
+# preprocessor against this spec.)
+
+TARGET_COLUMN = 'SalePrice'
+
+
+@dataclass(frozen=True)
+class Feature:
+    # column name as it appears in the data
+    name: str
+    # columns it is computed from; empty for a column read as-is
+    inputs: tuple = ()
+    # vectorized formula over the input columns as float64 arrays
+    compute: object = None
+    # keyword / form field name used by CustomData and the web form;
+    # defaults to the name as an identifier ('Yr Sold' -> 'Yr_Sold')
+    field: str = None
+    # type a form value must parse as (int fields reject '2.5')
+    kind: type = float
+
+    def __post_init__(self):
+        if self.field is None:
+            field = re.sub(r'\W+', '_', self.name).strip('_')
+            object.__setattr__(self, 'field', field if field[:1].isalpha() else f"f_{field}")
+
+    @property
+    def derived(self):
+        return self.compute is not None
+
+
+FEATURES = {feature.name: feature for feature in [
+    # raw Ames columns
+    Feature('Overall Qual', field='Overall_Qual', kind=int),
+    Feature('Gr Liv Area', field='Gr_Liv_Area', kind=int),
+    Feature('Garage Cars', field='Garage_Cars'),
+    Feature('Garage Area', field='Garage_Area'),
+    Feature('1st Flr SF', field='First_Flr_SF', kind=int),
+    Feature('2nd Flr SF', field='Second_Flr_SF', kind=int),
+    Feature('Total Bsmt SF', field='Total_Bsmt_SF'),
+    Feature('Lot Area', field='Lot_Area', kind=int),
+    Feature('BsmtFin SF 1', field='BsmtFin_SF_1'),
+    Feature('Full Bath', field='Full_Bath', kind=int),
+    Feature('Yr Sold', field='Yr_Sold', kind=int),
+    Feature('Year Built', field='Year_Built', kind=int),
+    Feature('Year Remod/Add', field='Year_Remod_Add', kind=int),
+    # derived columns; a client may also send one directly (its field),
+    # in which case the value is used as is instead of being computed
+    Feature('year_since_remod', ('Yr Sold', 'Year Remod/Add'), np.subtract,
+            field='year_since_remod', kind=int),
+    Feature('Log_SalePrice', (TARGET_COLUMN,), np.log1p),
+    # the notebook's extra features (EDA.ipynb / model.ipynb)
+    Feature('Total SF', ('Total Bsmt SF', '1st Flr SF', '2nd Flr SF'), lambda bsmt, first, second: bsmt + first + second),
+    Feature('Age', ('Yr Sold', 'Year Built'), np.subtract, kind=int),
+    Feature('Log Gr Liv Area', ('Gr Liv Area',), np.log1p),
+    Feature('Log 1st Flr SF', ('1st Flr SF',), np.log1p),
+    Feature('Log BsmtFin SF 1', ('BsmtFin SF 1',), np.log1p),
+]}
+
+_BASE_FEATURES = ['Overall Qual', 'Gr Liv Area', 'Garage Cars', 'Garage Area', '1st Flr SF',
+                  'Total Bsmt SF', 'Lot Area', 'BsmtFin SF 1', 'Full Bath', 'year_since_remod']
+FEATURE_SETS = {
+    'base': _BASE_FEATURES,
+    'extended': _BASE_FEATURES + ['Total SF', 'Age', 'Log Gr Liv Area', 'Log 1st Flr SF', 'Log BsmtFin SF 1'],
+}
+
+# what the preprocessor and the served model are fitted on, in order.
+# Training and serving must run with the same AMES_FEATURE_SET; the
+# pipeline's stage keys include this list, so switching it refits
+FEATURE_SET = os.environ.get('AMES_FEATURE_SET', 'base')
+if FEATURE_SET not in FEATURE_SETS:
+    raise ValueError(f"unknown AMES_FEATURE_SET {FEATURE_SET!r}, expected one of {list(FEATURE_SETS)}")
+MODEL_FEATURES = FEATURE_SETS[FEATURE_SET]
+
+
+def _spec(name):
+    # columns that are not declared are treated as raw pass-through columns
+    return FEATURES.get(name) or Feature(name)
+
+
+def required_columns(names):
+    # raw columns that have to be read to produce `names` (column pruning)
+    required, seen = [], set()
+
+    def visit(name):
+        if name in seen:
+            return
+        seen.add(name)
+        spec = _spec(name)
+        if not spec.derived:
+            required.append(name)
+        for dependency in spec.inputs:
+            visit(dependency)
+
+    for name in names:
+        visit(name)
+    return required
+
+
+# raw inputs a client sends (web form, CustomData) for the model features,
+# and their (form field, type); derived features are computed from them
+FORM_COLUMNS = required_columns(MODEL_FEATURES)
+FORM_FIELDS = [(_spec(column).field, _spec(column).kind) for column in FORM_COLUMNS]
+
+
+def resolve(lookup, names):
+    """
+    Returns the values of ``names`` (arrays or scalars). ``lookup(name)``
+    gives a column's value when the caller has it, else None; derived
+    columns it does not have are computed from their inputs as float64,
+    each once, and derived columns nobody asked for are never computed.
+    """
+    values = {}
+
+    def value(name):
+        if name not in values:
+            spec = _spec(name)
+            found = lookup(name)
+            if found is not None:
+                values[name] = found
+            elif spec.derived:
+                inputs = [np.asarray(value(dependency), dtype=np.float64) for dependency in spec.inputs]
+                values[name] = spec.compute(*inputs)
+            else:
+                raise KeyError(f"column {name!r} is neither in the data nor a declared derived feature")
+        return values[name]
+
+    return [value(name) for name in names]
+
+
+def compute_features(df, names):
+    """
+    Returns a DataFrame with exactly the columns ``names`` (same index as
+    ``df``). Derived columns that are already present are reused, the
+    others are computed from their inputs (see resolve).
+    """
+    import pandas as pd
+
+    columns = resolve(lambda name: df[name].to_numpy() if name in df.columns else None, names)
+    return pd.DataFrame(dict(zip(names, columns)), index=df.index)
@@ -0,0 +1,238 @@
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from src import iter_frame_chunks
+from src.features.build_features import DataTransformation, NUMERICAL_FEATURES, INTERIM_DTYPES
+
+# how far an out-of-core fit may sit from the in-memory one, in standard
+# deviations of the feature. Medians are exact while a column has at most
+# sketch_size values; beyond that the sketch's rank error (well under 0.1%
+# at the default 2048) moves them by a small fraction of a standard
+# deviation. Means and scales of complete columns agree to float summation
+# order (~1e-15 relative); on columns with missing values they move with the
+# imputed median, by at most the missing fraction times the median shift.
+# Transformed values only differ on the imputed entries.
+TOLERANCE_STD = 0.01
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch of one numeric column. Values are kept in
+    levels of at most ``k`` items; an overfull level is sorted and every
+    other item (random offset) is promoted to the next level with twice the
+    weight. Memory is O(k log n) and rank error shrinks as k grows. While
+    fewer than ``k`` values were seen nothing is compacted and quantiles
+    are exact.
+    """
+
+    def __init__(self, k=2048, seed=0):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compact()
+        return self
+
+    def merge(self, other):
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compact()
+        return self
+
+    def _compact(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self.k:
+                items = np.sort(items)
+                # an odd item out stays at this level with its weight
+                keep, items = (items[-1:], items[:-1]) if len(items) % 2 else (items[:0], items)
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    @property
+    def exact(self):
+        return len(self.levels) == 1
+
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        if self.exact:
+            return float(np.quantile(self.levels[0], q))
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level_items), 2.0 ** level)
+                                  for level, level_items in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        index = np.searchsorted(cumulative, q * cumulative[-1])
+        return float(items[order][min(index, len(items) - 1)])
+
+    def median(self):
+        return self.quantile(0.5)
+
+
+class StreamingFeatureStats:
+    """
+    Everything the imputer + scaler of ``get_data_transformer_object``
+    learn, accumulated chunk by chunk: a median sketch per feature and the
+    count / mean / sum of squared deviations of the non-missing values
+    (Chan et al. pairwise updates, so instances can also be merged).
+    ``to_preprocessor`` builds the fitted ColumnTransformer from them.
+    """
+
+    def __init__(self, columns=None, sketch_size=2048):
+        self.columns = list(columns or NUMERICAL_FEATURES)
+        n_features = len(self.columns)
+        self.sketches = [QuantileSketch(sketch_size, seed=i) for i in range(n_features)]
+        self.n_rows = 0
+        self.count = np.zeros(n_features)
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+
+    def _combine(self, count, mean, m2):
+        total = self.count + count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = mean - self.mean
+            new_mean = np.where(total > 0, self.mean + delta * count / total, 0.0)
+            new_m2 = self.m2 + m2 + np.where(total > 0, delta ** 2 * self.count * count / total, 0.0)
+        self.count, self.mean, self.m2 = total, new_mean, new_m2
+
+    def update(self, df):
+        values = df[self.columns].to_numpy(dtype=np.float64)
+        present = ~np.isnan(values)
+        count = present.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, np.nansum(values, axis=0) / np.maximum(count, 1), 0.0)
+        m2 = np.nansum((values - mean) ** 2 * present, axis=0)
+        self._combine(count, mean, m2)
+        for i, sketch in enumerate(self.sketches):
+            sketch.update(values[:, i])
+        self.n_rows += len(values)
+        return self
+
+    def merge(self, other):
+        if other.columns != self.columns:
+            raise ValueError("cannot merge stats over different columns")
+        self._combine(other.count, other.mean, other.m2)
+        for sketch, other_sketch in zip(self.sketches, other.sketches):
+            sketch.merge(other_sketch)
+        self.n_rows += other.n_rows
+        return self
+
+    def medians(self):
+        return np.array([sketch.median() for sketch in self.sketches])
+
+    def imputed_moments(self, medians=None):
+        # mean / population variance after the imputer filled every missing
+        # value with the median, which is what the scaler is fitted on
+        medians = self.medians() if medians is None else medians
+        n_missing = self.n_rows - self.count
+        n = self.n_rows
+        mean = (self.mean * self.count + medians * n_missing) / n
+        var = (self.m2 + self.count * (self.mean - mean) ** 2 + n_missing * (medians - mean) ** 2) / n
+        return mean, var
+
+    def to_preprocessor(self):
+        if self.n_rows == 0:
+            raise ValueError("no rows seen")
+        medians = self.medians()
+        mean, var = self.imputed_moments(medians)
+
+        # fit on a stand-in frame so sklearn sets up all of its fitted
+        # attributes, then replace the learned statistics
+        preprocessor = DataTransformation().get_data_transformer_object()
+        preprocessor.fit(pd.DataFrame([medians, medians], columns=self.columns))
+        pipeline = preprocessor.named_transformers_['num']
+        imputer, scaler = pipeline.named_steps['imputer'], pipeline.named_steps['scaler']
+
+        imputer.statistics_ = medians.astype(np.float64)
+        scaler.mean_ = mean
+        scaler.var_ = var
+        scale = np.sqrt(var)
+        # constant features are left unscaled, as StandardScaler does
+        scaler.scale_ = np.where(scale < 10 * np.finfo(scale.dtype).eps, 1.0, scale)
+        scaler.n_samples_seen_ = int(self.n_rows)
+        return preprocessor
+
+
+def fit_preprocessor_out_of_core(file_path, chunk_size=100000, sketch_size=2048):
+    """
+    Fits the imputer + scaler of ``get_data_transformer_object`` in one
+    streamed pass over ``file_path`` (parquet/csv/feather), holding a single
+    chunk of the 10 feature columns in memory at a time. Returns the fitted
+    preprocessor and the accumulated ``StreamingFeatureStats``.
+    """
+    stats = StreamingFeatureStats(sketch_size=sketch_size)
+    for chunk in iter_frame_chunks(file_path, chunk_size, NUMERICAL_FEATURES):
+        stats.update(chunk)
+    return stats.to_preprocessor(), stats
+
+
+def compare_preprocessors(reference, candidate):
+    # worst-case differences between two fitted preprocessors, in
+    # reference standard deviations
+    ref_pipe, cand_pipe = reference.named_transformers_['num'], candidate.named_transformers_['num']
+    ref_scaler, cand_scaler = ref_pipe.named_steps['scaler'], cand_pipe.named_steps['scaler']
+    ref_median, cand_median = ref_pipe.named_steps['imputer'].statistics_, cand_pipe.named_steps['imputer'].statistics_
+    std = ref_scaler.scale_
+    report = {
+        "median_diff_std": float(np.max(np.abs(ref_median - cand_median) / std)),
+        "mean_diff_std": float(np.max(np.abs(ref_scaler.mean_ - cand_scaler.mean_) / std)),
+        "scale_rel_diff": float(np.max(np.abs(ref_scaler.scale_ - cand_scaler.scale_) / std)),
+    }
+    report["within_tolerance"] = all(value <= TOLERANCE_STD for value in report.values())
+    return report
+
+
+def main(argv=None):
+    """
+    python -m src.features.streaming_stats --input train.parquet [--output preprocessor.pkl] [--check]
+
+    --check also fits the regular in-memory preprocessor (so the file must
+    fit in RAM) and exits 1 if the two differ by more than the tolerances.
+    """
+    from src import save_object, load_frame
+
+    parser = argparse.ArgumentParser(prog="python -m src.features.streaming_stats")
+    parser.add_argument("--input", required=True)
+    parser.add_argument("--output")
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--sketch-size", type=int, default=2048)
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args(argv)
+
+    preprocessor, stats = fit_preprocessor_out_of_core(args.input, args.chunk_size, args.sketch_size)
+    exact = all(sketch.exact for sketch in stats.sketches)
+    print(f"fitted on {int(stats.n_rows)} rows ({'exact' if exact else 'sketched'} medians)")
+    if args.output:
+        save_object(args.output, preprocessor)
+
+    if args.check:
+        dtypes = {col: INTERIM_DTYPES[col] for col in NUMERICAL_FEATURES}
+        reference = DataTransformation().get_data_transformer_object()
+        reference.fit(load_frame(args.input, columns=NUMERICAL_FEATURES, dtypes=dtypes))
+        report = compare_preprocessors(reference, preprocessor)
+        for key, value in report.items():
+            print(f"{key}: {value}")
+        return 0 if report["within_tolerance"] else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
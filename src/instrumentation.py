@@ -0,0 +1,139 @@
+"""
+Timing spans for the pipeline and serving hot paths.
+
+    from src.instrumentation import span
+
+    with span("preprocessor_fit"):
+        preprocessor.fit(train_df)
+
+Every span is recorded in a per-stage histogram, rendered in the
+Prometheus text format by ``render_prometheus`` (the Flask ``/metrics``
+route) and as a table by ``summary`` (printed at the end of a
+make_dataset run). Recording is off unless ``AMES_METRICS=1`` or
+``enable()`` was called; disabled spans are a shared no-op context
+manager. Spans recorded inside process-pool workers stay in the worker.
+"""
+import os
+import time
+import bisect
+import threading
+from contextlib import nullcontext
+
+# seconds; the upper bounds of the histogram buckets (+Inf is implicit)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+           0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_NAME = "ames_stage_duration_seconds"
+
+_enabled = os.environ.get("AMES_METRICS", "0") == "1"
+_stages = {}
+_lock = threading.Lock()
+_NULL_SPAN = nullcontext()
+
+
+class _StageStats:
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.bucket_counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+
+
+def span(stage):
+    # context manager timing the block under ``stage``
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(stage)
+
+
+def observe(stage, seconds):
+    with _lock:
+        stats = _stages.get(stage)
+        if stats is None:
+            stats = _stages[stage] = _StageStats()
+        stats.observe(seconds)
+
+
+def snapshot():
+    # {stage: {"count", "total_s", "mean_ms", "max_ms"}}
+    with _lock:
+        return {
+            stage: {
+                "count": stats.count,
+                "total_s": stats.total,
+                "mean_ms": stats.total / stats.count * 1000.0,
+                "max_ms": stats.max * 1000.0,
+            }
+            for stage, stats in _stages.items()
+        }
+
+
+def render_prometheus():
+    lines = [
+        f"# HELP {METRIC_NAME} Wall time of pipeline and serving stages.",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    with _lock:
+        for stage in sorted(_stages):
+            stats = _stages[stage]
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (float("inf"),), stats.bucket_counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {stats.total!r}')
+            lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {stats.count}')
+    return "\n".join(lines) + "\n"
+
+
+def summary():
+    stats = snapshot()
+    if not stats:
+        return "no timings recorded"
+    width = max(len(stage) for stage in stats)
+    lines = [f"{'stage':{width}s} {'count':>7s} {'total s':>10s} {'mean ms':>10s} {'max ms':>10s}"]
+    for stage, row in sorted(stats.items(), key=lambda item: -item[1]["total_s"]):
+        lines.append(f"{stage:{width}s} {row['count']:7d} {row['total_s']:10.3f} "
+                     f"{row['mean_ms']:10.2f} {row['max_ms']:10.2f}")
+    return "\n".join(lines)
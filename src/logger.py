@@ -1,6 +1,12 @@
 import logging
 import os
-from datetime import datetime
+import json
+import queue
+import atexit
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 # 1. Define the directory where all logs will be stored
 LOG_DIR = os.path.join(os.getcwd(), "logs")
@@ -8,22 +14,150 @@ LOG_DIR = os.path.join(os.getcwd(), "logs")
 # 2. Define the name of the specific log file
 LOG_FILE = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
 
-# 3. Create the logs directory if it doesn't exist
-os.makedirs(LOG_DIR, exist_ok=True)
-
-# 4. Define the final, complete file path
+# 3. Define the final, complete file path
 LOG_FILE_PATH = os.path.join(LOG_DIR, LOG_FILE)
 
+TEXT_FORMAT = "[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s"
+
+
+@dataclass
+class LoggingConfig:
+    # 'sync' writes from the calling thread; 'queue' hands records to a
+    # background writer thread so request threads never wait on disk
+    mode: str = field(default_factory=lambda: os.environ.get("AMES_LOG_MODE", "sync"))
+    # 'text' (the original line format) or 'json' (one object per line)
+    format: str = field(default_factory=lambda: os.environ.get("AMES_LOG_FORMAT", "text"))
+    level: str = field(default_factory=lambda: os.environ.get("AMES_LOG_LEVEL", "INFO"))
+    # fraction of DEBUG records kept (per-request dumps); INFO and up are never sampled
+    debug_sample_rate: float = field(
+        default_factory=lambda: float(os.environ.get("AMES_LOG_DEBUG_SAMPLE", 0.01)))
+    # size-based rotation of the log file; 0 disables rotation
+    max_bytes: int = field(
+        default_factory=lambda: int(os.environ.get("AMES_LOG_MAX_BYTES", 10 * 1024 * 1024)))
+    backup_count: int = field(default_factory=lambda: int(os.environ.get("AMES_LOG_BACKUP_COUNT", 5)))
+    # records buffered in queue mode; further records are dropped, not waited on
+    queue_size: int = 10000
+    file_path: str = LOG_FILE_PATH
+
+
+class JsonFormatter(logging.Formatter):
+    # attributes every LogRecord has; anything else came in through extra=
+    _RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self._RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DebugSampler(logging.Filter):
+    # runs on the handler, i.e. before the record's message is formatted,
+    # so dropped DEBUG records never pay for rendering their arguments
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    # never blocks the caller: records that do not fit the queue are counted and dropped
+    def __init__(self, record_queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _CreateDirOnOpen:
+    # the log directory and file appear with the first record, not at import
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+class LazyFileHandler(_CreateDirOnOpen, logging.FileHandler):
+    pass
 
-logging.basicConfig(
-    filename = LOG_FILE_PATH,
-    format = "[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s",
-    level = logging.INFO
-)
+
+class LazyRotatingFileHandler(_CreateDirOnOpen, RotatingFileHandler):
+    pass
+
+
+_installed_handlers = []
+_listener = None
+
+
+def _file_handler(config):
+    if config.max_bytes > 0:
+        handler = LazyRotatingFileHandler(config.file_path, maxBytes=config.max_bytes,
+                                          backupCount=config.backup_count, delay=True)
+    else:
+        handler = LazyFileHandler(config.file_path, delay=True)
+    handler.setFormatter(JsonFormatter() if config.format == "json" else logging.Formatter(TEXT_FORMAT))
+    return handler
+
+
+def stop_logging():
+    # flushes everything still queued and detaches the handlers
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    root = logging.getLogger()
+    for handler in _installed_handlers:
+        root.removeHandler(handler)
+        handler.close()
+    _installed_handlers.clear()
+
+
+def configure_logging(config=None):
+    # (re)installs the root handler; safe to call again to switch modes
+    global _listener
+    config = config or LoggingConfig()
+    if config.mode not in ("sync", "queue"):
+        raise ValueError(f"unknown logging mode: {config.mode}")
+    stop_logging()
+
+    file_handler = _file_handler(config)
+    if config.mode == "queue":
+        handler = DroppingQueueHandler(queue.Queue(config.queue_size))
+        _listener = QueueListener(handler.queue, file_handler)
+        _listener.start()
+        _installed_handlers.append(file_handler)
+    else:
+        handler = file_handler
+    handler.addFilter(DebugSampler(config.debug_sample_rate))
+
+    root = logging.getLogger()
+    root.setLevel(config.level.upper())
+    root.addHandler(handler)
+    _installed_handlers.insert(0, handler)
+    return config
+
+
+configure_logging()
+atexit.register(stop_logging)
 
 if __name__=="__main__":
     logging.info("Logging has started")
-    
-    
-    
-    
\ No newline at end of file
+
+
+
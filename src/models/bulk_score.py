@@ -0,0 +1,153 @@
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import pandas as pd
+
+from src.exception import CustomException
+from src import iter_frame_chunks
+from src.logger import logging
+from src.models.model_registry import ModelRegistry, ModelRegistryConfig
+from src.models.predict_model import FEATURE_COLUMNS, PredictPipeline, validate_features
+
+
+@dataclass
+class BulkScoreConfig:
+    input_path: str
+    output_path: str
+    chunk_size: int = 50000
+    workers: int = 0
+    id_column: str = None
+    prediction_column: str = "prediction"
+    model_path: str = os.path.join('models', 'model.pkl')
+    preprocessor_path: str = os.path.join('models', 'preprocessor.pkl')
+
+
+def _is_parquet(path):
+    return os.path.splitext(path)[1].lower() in ('.parquet', '.pq')
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet as pq
+        return pq
+    except ImportError:
+        raise ImportError("reading or writing parquet requires pyarrow (pip install pyarrow)")
+
+
+def iter_chunks(path, chunk_size, columns):
+    # yields DataFrames of at most chunk_size rows, reading only `columns`
+    if _is_parquet(path):
+        _require_pyarrow()
+    yield from iter_frame_chunks(path, chunk_size, columns)
+
+
+class _ChunkWriter:
+    # appends prediction chunks to a CSV or parquet file as they arrive
+    def __init__(self, path):
+        self.path = path
+        self._parquet_writer = None
+        self._wrote_header = False
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def write(self, df):
+        if _is_parquet(self.path):
+            pq = _require_pyarrow()
+            import pyarrow as pa
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode='a' if self._wrote_header else 'w',
+                      header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+# per-process state for pool workers, set up once by _init_worker
+_worker_pipeline = None
+
+
+def _init_worker(model_path, preprocessor_path):
+    global _worker_pipeline
+    registry = ModelRegistry(ModelRegistryConfig(
+        model_path=model_path, preprocessor_path=preprocessor_path, check_interval=None))
+    registry.preload()
+    _worker_pipeline = PredictPipeline(registry=registry)
+
+
+def _score_chunk(chunk, config):
+    try:
+        features = validate_features(chunk)
+    except ValueError as e:
+        raise ValueError(f"rows starting at {chunk.index[0]}: {e}")
+
+    out = pd.DataFrame({config.prediction_column: _worker_pipeline.predict_batch(features)})
+    if config.id_column:
+        out.insert(0, config.id_column, chunk[config.id_column].to_numpy())
+    return out
+
+
+class BulkScorer:
+    """
+    Scores an arbitrarily large CSV/parquet file in fixed-size chunks and
+    writes the predictions incrementally, so memory stays bounded by
+    ``chunk_size`` (times ``2 * workers`` chunks in flight with a pool).
+    """
+
+    def __init__(self, config):
+        self.config = config
+
+    def _columns(self):
+        columns = list(FEATURE_COLUMNS)
+        if self.config.id_column:
+            columns.append(self.config.id_column)
+        return columns
+
+    def run(self):
+        try:
+            config = self.config
+            chunks = iter_chunks(config.input_path, config.chunk_size, self._columns())
+            writer = _ChunkWriter(config.output_path)
+            n_rows = 0
+            try:
+                if config.workers and config.workers > 1:
+                    results = self._score_parallel(chunks)
+                else:
+                    _init_worker(config.model_path, config.preprocessor_path)
+                    results = (_score_chunk(chunk, config) for chunk in chunks)
+
+                for out in results:
+                    writer.write(out)
+                    n_rows += len(out)
+            finally:
+                writer.close()
+
+            logging.info(f"bulk scored {n_rows} rows from {config.input_path} into {config.output_path}")
+            return n_rows
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _score_parallel(self, chunks):
+        # keep at most 2 chunks per worker in flight and yield in input order
+        config = self.config
+        max_in_flight = 2 * config.workers
+        with ProcessPoolExecutor(
+                max_workers=config.workers,
+                initializer=_init_worker,
+                initargs=(config.model_path, config.preprocessor_path)) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(_score_chunk, chunk, config))
+                if len(pending) >= max_in_flight:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
@@ -0,0 +1,307 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import weakref
+
+import numpy as np
+
+from src.exception import CustomException
+from src.logger import logging
+from src.models.predict_model import FEATURE_COLUMNS
+
+
+def _numeric_steps(preprocessor):
+    # pulls the fitted imputer/scaler out of the ColumnTransformer built by
+    # DataTransformation.get_data_transformer_object
+    transformers = [t for t in preprocessor.transformers_ if t[0] != 'remainder']
+    if len(transformers) != 1:
+        raise ValueError("only a single numeric pipeline can be compiled")
+
+    _, pipeline, columns = transformers[0]
+    if list(columns) != FEATURE_COLUMNS:
+        raise ValueError(f"preprocessor columns {list(columns)} do not match {FEATURE_COLUMNS}")
+
+    steps = dict(pipeline.named_steps)
+    if set(steps) != {'imputer', 'scaler'}:
+        raise ValueError(f"unsupported preprocessing steps: {list(steps)}")
+    return steps['imputer'], steps['scaler']
+
+
+def _flatten_trees(model):
+    # concatenates every tree into shared node tables; leaves point to
+    # themselves so a fixed number of descent steps lands every row on a leaf.
+    # Only models whose prediction is the plain mean of their trees' leaf
+    # values: boosting (GBM, AdaBoost) adds scaled or weighted trees instead
+    from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+    from sklearn.tree import DecisionTreeRegressor
+
+    if type(model) not in (RandomForestRegressor, ExtraTreesRegressor, DecisionTreeRegressor):
+        raise ValueError(f"{type(model).__name__} cannot be compiled: only random forests, "
+                         f"extra trees and single decision trees are supported")
+    estimators = getattr(model, 'estimators_', [model])
+
+    roots, children, feature, threshold, value = [], [], [], [], []
+    offset = 0
+    for est in estimators:
+        tree = est.tree_
+        n_nodes = tree.node_count
+        nodes = np.arange(n_nodes)
+        is_leaf = tree.children_left == -1
+
+        # children[2 * node + went_left] -> next node
+        pairs = np.empty(2 * n_nodes, dtype=np.int64)
+        pairs[0::2] = np.where(is_leaf, nodes, tree.children_right) + offset
+        pairs[1::2] = np.where(is_leaf, nodes, tree.children_left) + offset
+
+        roots.append(offset)
+        children.append(pairs)
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+        value.append(tree.value[:, 0, 0])
+        offset += n_nodes
+
+    return {
+        'roots': np.asarray(roots, dtype=np.int64),
+        'children': np.concatenate(children),
+        'feature': np.concatenate(feature).astype(np.int64),
+        'threshold': np.concatenate(threshold).astype(np.float64),
+        'value': np.concatenate(value).astype(np.float64),
+        'max_depth': np.int64(max(est.tree_.max_depth for est in estimators)),
+    }
+
+
+class CompiledPreprocessor:
+    # median imputation + standard scaling as three precomputed vectors
+
+    ARRAY_NAMES = ('fill', 'mean', 'scale')
+
+    def __init__(self, fill, mean, scale):
+        self.fill = fill
+        self.mean = mean
+        self.scale = scale
+
+    @classmethod
+    def from_sklearn(cls, preprocessor):
+        imputer, scaler = _numeric_steps(preprocessor)
+        n_features = len(FEATURE_COLUMNS)
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+        return cls(
+            fill=np.asarray(imputer.statistics_, dtype=np.float64),
+            mean=np.asarray(mean, dtype=np.float64),
+            scale=np.asarray(scale, dtype=np.float64),
+        )
+
+    def transform(self, X):
+        # accepts a DataFrame with FEATURE_COLUMNS or a 2-D array in that order
+        if hasattr(X, 'columns'):
+            X = X[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        X = np.array(X, dtype=np.float64, ndmin=2)
+        missing = np.isnan(X)
+        if missing.any():
+            X = np.where(missing, self.fill, X)
+        return (X - self.mean) / self.scale
+
+
+# sklearn preprocessors reduced to their CompiledPreprocessor on first use
+_row_preprocessors = weakref.WeakKeyDictionary()
+
+
+def transform_input(preprocessor, features):
+    # DataFrames go through the preprocessor as fitted. A 2-D float array in
+    # FEATURE_COLUMNS order (HouseFeatures.row) cannot, since the
+    # ColumnTransformer selects columns by name, so it goes through the
+    # preprocessor's compiled vectors instead (same result, see check_parity)
+    if hasattr(features, 'columns') or isinstance(preprocessor, CompiledPreprocessor):
+        return preprocessor.transform(features)
+    compiled = _row_preprocessors.get(preprocessor)
+    if compiled is None:
+        compiled = _row_preprocessors[preprocessor] = CompiledPreprocessor.from_sklearn(preprocessor)
+    return compiled.transform(features)
+
+
+class CompiledForest:
+    # every tree of the ensemble flattened into shared node tables
+
+    ARRAY_NAMES = ('roots', 'children', 'feature', 'threshold', 'value', 'max_depth')
+
+    def __init__(self, roots, children, feature, threshold, value, max_depth):
+        self.roots = roots
+        self.children = children
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.max_depth = int(np.asarray(max_depth).item())
+
+    @classmethod
+    def from_sklearn(cls, model):
+        return cls(**_flatten_trees(model))
+
+    def predict(self, X):
+        # sklearn trees compare float32 inputs against float64 thresholds
+        Xt = np.asarray(X, dtype=np.float32)
+        if Xt.ndim == 1:
+            Xt = Xt[None, :]
+        n_rows, n_features = Xt.shape
+        flat = Xt.ravel()
+        # one column of node ids per input row, one row per tree
+        node = np.repeat(np.asarray(self.roots)[:, None], n_rows, axis=1)
+        row_offset = 0 if n_rows == 1 else (np.arange(n_rows) * n_features)[None, :]
+
+        # every tree descends one level per step; leaves loop onto themselves
+        for _ in range(self.max_depth):
+            went_left = flat[self.feature[node] + row_offset] <= self.threshold[node]
+            node = self.children[2 * node + went_left]
+        return self.value[node].mean(axis=0)
+
+
+class CompiledPipeline:
+    """
+    Pure-NumPy equivalent of the served preprocessor + tree ensemble.
+
+    ``predict`` takes a 2-D float array whose columns are FEATURE_COLUMNS
+    (NaN for missing values) and skips pandas and sklearn's per-call input
+    validation entirely.
+    """
+
+    def __init__(self, preprocessor, forest):
+        self.preprocessor = preprocessor
+        self.forest = forest
+
+    @classmethod
+    def from_sklearn(cls, preprocessor, model):
+        try:
+            return cls(CompiledPreprocessor.from_sklearn(preprocessor),
+                       CompiledForest.from_sklearn(model))
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def arrays(self):
+        arrays = {}
+        for part in (self.preprocessor, self.forest):
+            arrays.update({name: np.asarray(getattr(part, name)) for name in part.ARRAY_NAMES})
+        return arrays
+
+    def save(self, file_path):
+        try:
+            np.savez(file_path, **self.arrays())
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @classmethod
+    def load(cls, file_path):
+        try:
+            with np.load(file_path) as data:
+                return cls(
+                    CompiledPreprocessor(**{n: data[n] for n in CompiledPreprocessor.ARRAY_NAMES}),
+                    CompiledForest(**{n: data[n] for n in CompiledForest.ARRAY_NAMES}),
+                )
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def transform(self, X):
+        return self.preprocessor.transform(X)
+
+    def predict(self, X):
+        return self.forest.predict(self.preprocessor.transform(X))
+
+
+# --- pickle-free artifact format ------------------------------------------
+#
+# An artifact is a directory holding one .npy file per array plus a
+# manifest.json naming the object kind. Arrays are opened with
+# np.load(mmap_mode='r'), so every worker process maps the same page-cache
+# pages instead of unpickling its own copy, and loading executes no code.
+
+MANIFEST_NAME = 'manifest.json'
+ARTIFACT_FORMAT = 'ames-npy'
+ARTIFACT_KINDS = {
+    'preprocessor': CompiledPreprocessor,
+    'forest': CompiledForest,
+}
+
+
+def is_array_artifact(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+def save_array_artifact(dir_path, obj):
+    # obj is a CompiledPreprocessor/CompiledForest, or the fitted sklearn
+    # object it is compiled from
+    try:
+        if not isinstance(obj, tuple(ARTIFACT_KINDS.values())):
+            if hasattr(obj, 'transformers_'):
+                obj = CompiledPreprocessor.from_sklearn(obj)
+            else:
+                obj = CompiledForest.from_sklearn(obj)
+        kind = next(k for k, cls in ARTIFACT_KINDS.items() if isinstance(obj, cls))
+
+        # build next to the target and swap it in, so readers never see a
+        # half-written directory
+        dir_path = os.path.normpath(dir_path)
+        tmp_path = f"{dir_path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        arrays = {}
+        for name in obj.ARRAY_NAMES:
+            array = np.ascontiguousarray(getattr(obj, name))
+            file_name = f"{name}.npy"
+            np.save(os.path.join(tmp_path, file_name), array)
+            arrays[name] = {
+                'file': file_name,
+                'dtype': str(array.dtype),
+                'shape': list(array.shape),
+                'sha256': hashlib.sha256(array.tobytes()).hexdigest(),
+            }
+
+        manifest = {'format': ARTIFACT_FORMAT, 'version': 1, 'kind': kind, 'arrays': arrays}
+        with open(os.path.join(tmp_path, MANIFEST_NAME), 'w') as file_obj:
+            json.dump(manifest, file_obj, indent=2)
+
+        old_path = f"{dir_path}.old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(dir_path):
+            os.replace(dir_path, old_path)
+        os.replace(tmp_path, dir_path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        return dir_path
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def load_array_artifact(dir_path, mmap_mode='r'):
+    with open(os.path.join(dir_path, MANIFEST_NAME)) as file_obj:
+        manifest = json.load(file_obj)
+    if manifest.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(f"{dir_path} is not an {ARTIFACT_FORMAT} artifact")
+
+    cls = ARTIFACT_KINDS[manifest['kind']]
+    if set(manifest['arrays']) != set(cls.ARRAY_NAMES):
+        raise ValueError(f"{dir_path}: manifest arrays {sorted(manifest['arrays'])} "
+                         f"do not match {manifest['kind']} {sorted(cls.ARRAY_NAMES)}")
+    arrays = {}
+    for name, spec in manifest['arrays'].items():
+        array = np.load(os.path.join(dir_path, spec['file']), mmap_mode=mmap_mode, allow_pickle=False)
+        # a .npy swapped or truncated after the manifest was written would
+        # otherwise only fail (or silently mispredict) on the first request
+        if str(array.dtype) != spec['dtype'] or list(array.shape) != spec['shape']:
+            raise ValueError(f"{dir_path}: {spec['file']} is {array.dtype}{list(array.shape)}, "
+                             f"manifest says {spec['dtype']}{spec['shape']}")
+        arrays[name] = array
+    return cls(**arrays)
+
+
+def check_parity(compiled, preprocessor, model, features, rtol=1e-9):
+    # compares the compiled engine with the sklearn pipeline on a DataFrame
+    # of FEATURE_COLUMNS; returns the max absolute difference
+    expected = model.predict(preprocessor.transform(features))
+    actual = compiled.predict(features[FEATURE_COLUMNS].to_numpy(dtype=np.float64))
+    max_diff = float(np.max(np.abs(expected - actual))) if len(expected) else 0.0
+    if not np.allclose(expected, actual, rtol=rtol, atol=0.0):
+        raise ValueError(f"compiled model diverges from sklearn pipeline (max abs diff {max_diff})")
+    logging.info(f"compiled model parity ok on {len(expected)} rows (max abs diff {max_diff})")
+    return max_diff
@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.exception import CustomException
+from src.logger import logging
+from src import _limit_inner_jobs
+from src.instrumentation import span
+from src.shared_arrays import share_arrays, open_shared
+
+
+@dataclass
+class CrossValidationConfig:
+    # score candidates by repeated stratified K-fold on the training split
+    # instead of by the single held-out test split
+    enabled: bool = False
+    n_splits: int = 5
+    n_repeats: int = 1
+    # strata are quantile bins of the target, so every fold sees the same
+    # price distribution
+    n_bins: int = 5
+    random_state: int = 42
+    # fold fits run in parallel processes (-1 = all cores)
+    n_jobs: int = -1
+
+
+def target_strata(y, n_bins):
+    # quantile bin of every target value; tied edges collapse into one bin
+    edges = np.unique(np.quantile(y, np.linspace(0, 1, n_bins + 1)[1:-1]))
+    return np.searchsorted(edges, y, side="right")
+
+
+def stratified_fold_indices(y, n_splits=5, n_repeats=1, n_bins=5, random_state=42):
+    """
+    Returns ``[(train_index, test_index), ...]`` for ``n_repeats`` x
+    ``n_splits`` folds as sorted int arrays; the data itself is never
+    copied. Rows are ordered by stratum and, within a stratum, randomly,
+    then dealt to the folds round robin, so each fold gets every stratum in
+    proportion (fold sizes differ by at most one row).
+    """
+    y = np.asarray(y)
+    strata = target_strata(y, n_bins)
+    rng = np.random.default_rng(random_state)
+    positions = np.arange(len(y))
+    folds = []
+    for _ in range(n_repeats):
+        order = np.lexsort((rng.permutation(len(y)), strata))
+        fold_of = np.empty(len(y), dtype=np.int64)
+        fold_of[order] = positions % n_splits
+        for fold in range(n_splits):
+            in_test = fold_of == fold
+            folds.append((np.flatnonzero(~in_test), np.flatnonzero(in_test)))
+    return folds
+
+
+def _fit_fold(model, x, y, train_index, test_index, fit_target=None):
+    # runs in a pool worker (or inline when n_jobs == 1)
+    from sklearn.metrics import r2_score
+
+    x = open_shared(x)
+    start = time.perf_counter()
+    with span("model_fit"):
+        model.fit(x[train_index], (y if fit_target is None else fit_target)[train_index])
+    score = r2_score(y[test_index], model.predict(x[test_index]))
+    return float(score), time.perf_counter() - start
+
+
+def cross_validate(model, x, y, folds, n_jobs=-1, fit_target=None):
+    """
+    Fits a fresh clone of ``model`` on every fold of ``folds`` (from
+    ``stratified_fold_indices``) and returns the fold r2 scores with their
+    mean and standard deviation. Folds run in parallel processes, each
+    gathering only its own rows from ``x``. ``fit_target`` replaces ``y``
+    as the target the model is fitted on (e.g. a teacher's predictions for
+    a distilled model); the scores are always against ``y``.
+    """
+    try:
+        from sklearn.base import clone
+
+        y = np.asarray(y)
+        fit_target = None if fit_target is None else np.asarray(fit_target)
+        if n_jobs == -1:
+            n_jobs = os.cpu_count() or 1
+        n_workers = max(1, min(n_jobs, len(folds)))
+
+        start = time.perf_counter()
+        if n_workers == 1:
+            results = [_fit_fold(clone(model), x, y, train, test, fit_target) for train, test in folds]
+        else:
+            # workers get a handle to one shared copy of x, not a pickled copy each
+            with share_arrays(x) as (x_shared,), ProcessPoolExecutor(max_workers=n_workers) as pool:
+                futures = [pool.submit(_fit_fold, _limit_inner_jobs(clone(model), n_workers),
+                                       x_shared, y, train, test, fit_target)
+                           for train, test in folds]
+                results = [future.result() for future in futures]
+
+        scores = np.array([score for score, _ in results])
+        return {
+            "scores": scores.tolist(),
+            "mean": float(scores.mean()),
+            "std": float(scores.std()),
+            "n_folds": len(folds),
+            "fold_fit_s": float(np.mean([seconds for _, seconds in results])),
+            "wall_time_s": time.perf_counter() - start,
+        }
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def cross_validate_models(models, x, y, config=None, fit_target=None):
+    # {name: cross_validate report} over the same folds for every candidate
+    # (the folds depend on y and the config only, so separate calls with
+    # the same y and config also share them)
+    config = config or CrossValidationConfig()
+    folds = stratified_fold_indices(y, config.n_splits, config.n_repeats, config.n_bins, config.random_state)
+    reports = {}
+    for name, model in models.items():
+        reports[name] = cross_validate(model, x, y, folds, n_jobs=config.n_jobs, fit_target=fit_target)
+        logging.info(f"cross-validation {name}: mean r2 {reports[name]['mean']:.4f} "
+                     f"+/- {reports[name]['std']:.4f} over {len(folds)} folds")
+    return reports
@@ -0,0 +1,258 @@
+import os
+import sys
+import json
+import glob
+import shutil
+import tempfile
+from datetime import datetime
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import r2_score
+
+from src.exception import CustomException
+from src.logger import logging
+from src import save_object, load_object, save_frame, load_frame
+from src.features.build_features import NUMERICAL_FEATURES, TARGET_COLUMN, INTERIM_DTYPES
+from src.features.feature_spec import compute_features
+from src.features.streaming_stats import StreamingFeatureStats
+from src.models.model_registry import file_digest, publish_version
+
+
+@dataclass
+class IncrementalTrainerConfig:
+    model_path: str = os.path.join("../../models", "model.pkl")
+    preprocessor_path: str = os.path.join("../../models", "preprocessor.pkl")
+    # running imputer/scaler statistics and the age of every tree
+    stats_path: str = os.path.join("../../models", "preprocessor_stats.pkl")
+    state_path: str = os.path.join("../../models", "incremental_state.json")
+    # the full training split; read once to seed the statistics
+    base_train_path: str = os.path.join("../../data/interim", "train.parquet")
+    # every refresh's new rows are appended here as one parquet part. A full
+    # retrain (make_dataset.py) only trains on base_train_path, so the first
+    # refresh after it moves these parts to increments_dir/superseded/
+    increments_dir: str = os.path.join("../../data/interim", "train_increments")
+    trees_per_refresh: int = 20
+    # oldest trees are retired once the forest would grow past this
+    max_trees: int = 300
+    # refreshes a tree survives at most; None retires by max_trees only
+    max_tree_age: int = None
+    # recently stored rows mixed into each refresh, per new row, so the
+    # new trees do not see a single day's sales only
+    replay_ratio: float = 1.0
+    sketch_size: int = 2048
+    # versioned registry every refreshed pair is published to (see
+    # publish_version); None only updates model_path/preprocessor_path
+    registry_dir: str = None
+    activate_new_version: bool = False
+    keep_versions: int = 10
+
+
+def prepare_rows(df):
+    # raw Ames-style sales -> the 10 features + target (rows without a price are dropped)
+    try:
+        df = compute_features(df, NUMERICAL_FEATURES + [TARGET_COLUMN])
+    except KeyError as e:
+        raise ValueError(f"new rows are missing columns: {e}")
+    return df[df[TARGET_COLUMN].notna()].reset_index(drop=True)
+
+
+def _scaler(preprocessor):
+    return preprocessor.named_transformers_['num'].named_steps['scaler']
+
+
+def rescale_thresholds(forest, old_preprocessor, new_preprocessor):
+    """
+    Trees split on standardized features. When the scaler's mean/scale
+    change, rewriting every split threshold from the old standardized
+    space to the new one keeps the existing trees making the same
+    decisions on raw inputs. The exceptions are imputed values, whose fill
+    value may have moved with the median, and inputs that fall exactly on
+    a split point. For those the side was already decided by float32
+    rounding in the original tree.
+    """
+    old, new = _scaler(old_preprocessor), _scaler(new_preprocessor)
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        split = tree.children_left != -1
+        feature = tree.feature[split]
+        raw = tree.threshold[split] * old.scale_[feature] + old.mean_[feature]
+        # tree_.threshold is a view on the node array, so this edits the tree
+        tree.threshold[split] = (raw - new.mean_[feature]) / new.scale_[feature]
+
+
+class IncrementalTrainer:
+    """
+    Daily refresh of the production forest. Each refresh folds the new
+    rows into the running preprocessor statistics, rewrites the existing
+    trees' thresholds for the updated scaler, retires the oldest trees and
+    grows ``trees_per_refresh`` new ones (``warm_start``) on the new rows
+    plus a replay sample of recent ones. Cost is proportional to the new
+    data; the full training set is only read once to seed the statistics.
+
+    The refresh state records the digest of the model it wrote. When
+    model.pkl no longer matches (a full retrain replaced it), the
+    statistics and tree ages are reseeded from the base training split and
+    the stored increments, which the retrained model never saw, are
+    set aside rather than replayed.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or IncrementalTrainerConfig()
+
+    def _publish(self, stats, preprocessor, forest, state, metrics):
+        # every output is written to a staging directory first; the live
+        # files are only replaced once all of them are complete, so serving
+        # never loads the new model next to the old preprocessor
+        models_dir = os.path.dirname(os.path.abspath(self.config.model_path))
+        os.makedirs(models_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".incremental-", dir=models_dir)
+        try:
+            staged = {}
+            for path, obj in ((self.config.stats_path, stats),
+                              (self.config.preprocessor_path, preprocessor),
+                              (self.config.model_path, forest)):
+                staged[path] = os.path.join(staging, f"{len(staged)}-{os.path.basename(path)}")
+                save_object(staged[path], obj)
+            # ties the statistics and tree ages to this exact model file
+            state = dict(state, model_digest=file_digest(staged[self.config.model_path]))
+            staged[self.config.state_path] = os.path.join(staging, "state.json")
+            with open(staged[self.config.state_path], "w") as file_obj:
+                json.dump(state, file_obj)
+
+            version = None
+            if self.config.registry_dir:
+                # the registry gets the pair as one immutable version
+                version = publish_version(
+                    self.config.registry_dir, staged[self.config.model_path],
+                    staged[self.config.preprocessor_path], metrics=metrics,
+                    activate=self.config.activate_new_version, keep=self.config.keep_versions)
+
+            # renames only from here on: preprocessor and model back to back
+            # (the registry version above is the strictly paired copy), the
+            # refresh state last
+            for path, staged_path in staged.items():
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                os.replace(staged_path, path)
+            return version
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def _stored_parts(self):
+        return sorted(glob.glob(os.path.join(self.config.increments_dir, "part-*.parquet")))
+
+    def _load_state(self, n_trees, model_digest):
+        # None when there is no state for the current model.pkl: never
+        # refreshed, or retrained from scratch since the last refresh
+        if not os.path.exists(self.config.state_path):
+            return None
+        with open(self.config.state_path) as file_obj:
+            state = json.load(file_obj)
+        if state.get("model_digest") != model_digest or len(state["tree_refresh"]) != n_trees:
+            return None
+        return state
+
+    def _supersede_increments(self):
+        # the retrained model never saw these rows; keep them out of the
+        # statistics and the replay sample, but do not delete data
+        parts = self._stored_parts()
+        if parts:
+            superseded = os.path.join(self.config.increments_dir, "superseded")
+            os.makedirs(superseded, exist_ok=True)
+            for path in parts:
+                os.replace(path, os.path.join(superseded, os.path.basename(path)))
+            logging.info(f"model was retrained, moved {len(parts)} increment parts to {superseded}")
+
+    def _load_stats(self, reseed):
+        if os.path.exists(self.config.stats_path) and not reseed:
+            return load_object(self.config.stats_path)
+
+        logging.info("seeding incremental preprocessor statistics from the stored training set")
+        stats = StreamingFeatureStats(sketch_size=self.config.sketch_size)
+        for path in [self.config.base_train_path, *self._stored_parts()]:
+            stats.update(load_frame(path, columns=NUMERICAL_FEATURES))
+        return stats
+
+    def _replay_rows(self, n_rows):
+        # newest stored rows first; the base split only until increments exist
+        parts = self._stored_parts()[::-1] or [self.config.base_train_path]
+        frames, total = [], 0
+        for path in parts:
+            if total >= n_rows:
+                break
+            frame = load_frame(path, columns=NUMERICAL_FEATURES + [TARGET_COLUMN])
+            frames.append(frame)
+            total += len(frame)
+        if not frames or n_rows == 0:
+            return pd.DataFrame(columns=NUMERICAL_FEATURES + [TARGET_COLUMN])
+        replay = pd.concat(frames, ignore_index=True)
+        return replay.sample(n=min(n_rows, len(replay)), random_state=len(replay))
+
+    def _retire(self, forest, tree_refresh, refresh):
+        keep = np.ones(len(forest.estimators_), dtype=bool)
+        if self.config.max_tree_age is not None:
+            keep &= refresh - np.asarray(tree_refresh) <= self.config.max_tree_age
+        # trees are in age order, so the first ones are the oldest
+        excess = int(keep.sum()) + self.config.trees_per_refresh - self.config.max_trees
+        if excess > 0:
+            keep[np.flatnonzero(keep)[:excess]] = False
+        forest.estimators_ = [est for est, kept in zip(forest.estimators_, keep) if kept]
+        return [age for age, kept in zip(tree_refresh, keep) if kept], int((~keep).sum())
+
+    def refresh(self, new_rows, test_df=None):
+        try:
+            new_rows = prepare_rows(new_rows)
+            if new_rows.empty:
+                raise ValueError("no new rows with a sale price")
+
+            forest = load_object(self.config.model_path)
+            if not isinstance(forest, RandomForestRegressor):
+                raise ValueError(f"incremental refresh needs a RandomForestRegressor, got {type(forest).__name__}")
+            old_preprocessor = load_object(self.config.preprocessor_path)
+            state = self._load_state(len(forest.estimators_), file_digest(self.config.model_path))
+            if state is None:
+                self._supersede_increments()
+                state = {"refresh": 0, "tree_refresh": [0] * len(forest.estimators_)}
+            stats = self._load_stats(reseed=state["refresh"] == 0)
+            refresh = state["refresh"] + 1
+
+            stats.update(new_rows)
+            preprocessor = stats.to_preprocessor()
+            rescale_thresholds(forest, old_preprocessor, preprocessor)
+
+            tree_refresh, retired = self._retire(forest, state["tree_refresh"], refresh)
+            replay = self._replay_rows(int(len(new_rows) * self.config.replay_ratio))
+            fit_rows = pd.concat([new_rows, replay], ignore_index=True)
+
+            forest.warm_start = True
+            forest.n_estimators = len(forest.estimators_) + self.config.trees_per_refresh
+            forest.fit(preprocessor.transform(fit_rows), fit_rows[TARGET_COLUMN].to_numpy(dtype=np.float64))
+            tree_refresh += [refresh] * self.config.trees_per_refresh
+
+            result = {
+                "refresh": refresh,
+                "new_rows": len(new_rows),
+                "replay_rows": len(replay),
+                "retired_trees": retired,
+                "trees": len(forest.estimators_),
+                "rows_seen": int(stats.n_rows),
+            }
+            if test_df is not None:
+                test_df = prepare_rows(test_df)
+                result["r2_score"] = float(r2_score(
+                    test_df[TARGET_COLUMN], forest.predict(preprocessor.transform(test_df))))
+
+            part = f"part-{datetime.now().strftime('%Y%m%d%H%M%S')}-{refresh:05d}.parquet"
+            save_frame(new_rows, os.path.join(self.config.increments_dir, part), dtypes=INTERIM_DTYPES)
+            version = self._publish(stats, preprocessor, forest,
+                                    {"refresh": refresh, "tree_refresh": tree_refresh},
+                                    metrics={key: value for key, value in result.items() if key == "r2_score"})
+            if version:
+                result["registry_version"] = version
+            logging.info(f"incremental refresh done: {result}")
+            return result
+
+        except Exception as e:
+            raise CustomException(e, sys)
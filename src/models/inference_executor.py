@@ -0,0 +1,115 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+
+from src.logger import logging
+from src.models.predict_model import PredictPipeline, warm_up
+
+
+class ServerOverloaded(Exception):
+    # raised instead of queueing once max_pending requests are in flight
+    pass
+
+
+@dataclass
+class InferenceExecutorConfig:
+    # 'thread' shares one set of artifacts; 'process' sidesteps the GIL
+    # with one preloaded copy per worker
+    kind: str = 'thread'
+    workers: int = 4
+    # requests admitted (running + waiting for a worker) before 503s
+    max_pending: int = 64
+    # how long shutdown waits for in-flight requests
+    drain_timeout: float = 30.0
+
+
+def _preload_worker():
+    warm_up()
+
+
+def _noop(_):
+    return None
+
+
+def _predict(features, routed=False):
+    if routed:
+        return PredictPipeline().predict_routed(features)[0]
+    return PredictPipeline().predict_batch(features)
+
+
+class InferenceExecutor:
+    """
+    Runs ``PredictPipeline`` inference off the event loop on a bounded
+    thread or process pool. Admission is capped at ``max_pending``
+    (callers get ServerOverloaded, i.e. a 503) and ``shutdown`` stops
+    admitting, drains in-flight requests and then closes the pool.
+    ``predict_fn(features, routed)`` is what runs on the pool, e.g. the web
+    app's serve_prediction so its cache and micro batcher apply; it has to
+    be a module-level function for the process pool.
+    """
+
+    def __init__(self, config=None, predict_fn=_predict):
+        self.config = config or InferenceExecutorConfig()
+        self.predict_fn = predict_fn
+        self._executor = None
+        self._pending = 0
+        self._closing = False
+        self._idle = None
+
+    def start(self):
+        if self.config.kind == 'process':
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.config.workers, initializer=_preload_worker)
+            # workers are spawned on demand; force them (and their model
+            # loads via the initializer) up front, before traffic arrives
+            list(self._executor.map(_noop, range(self.config.workers)))
+        elif self.config.kind == 'thread':
+            _preload_worker()
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.config.workers, thread_name_prefix='inference')
+        else:
+            raise ValueError(f"unknown executor kind: {self.config.kind}")
+        self._closing = False
+        logging.info(f"inference executor started: {self.config}")
+        return self
+
+    @property
+    def pending(self):
+        return self._pending
+
+    @property
+    def accepting(self):
+        return self._executor is not None and not self._closing
+
+    async def predict(self, features, routed=False):
+        # must be awaited on the event loop that calls shutdown; routed
+        # requests take part in the registry's canary/shadow scoring
+        if not self.accepting:
+            raise ServerOverloaded("server is shutting down")
+        if self._pending >= self.config.max_pending:
+            raise ServerOverloaded(f"{self._pending} requests in flight")
+
+        if self._idle is None:
+            self._idle = asyncio.Event()
+        self._pending += 1
+        self._idle.clear()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self.predict_fn, features, routed)
+        finally:
+            self._pending -= 1
+            if self._pending == 0:
+                self._idle.set()
+
+    async def shutdown(self):
+        self._closing = True
+        if self._pending and self._idle is not None:
+            logging.info(f"draining {self._pending} in-flight requests")
+            try:
+                await asyncio.wait_for(self._idle.wait(), self.config.drain_timeout)
+            except asyncio.TimeoutError:
+                logging.info(f"drain timed out with {self._pending} requests in flight")
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        logging.info("inference executor stopped")
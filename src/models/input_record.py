@@ -0,0 +1,82 @@
+import math
+
+import numpy as np
+
+from src.features.feature_spec import FEATURES, FORM_COLUMNS, MODEL_FEATURES, resolve
+
+# (column, form field, type) of every value a request may carry: the raw
+# inputs of the model features (FORM_COLUMNS) plus the derived model
+# features themselves, which a client may send instead of their inputs
+SCHEMA = tuple(
+    (column, FEATURES[column].field, FEATURES[column].kind)
+    for column in dict.fromkeys(FORM_COLUMNS + [c for c in MODEL_FEATURES if FEATURES[c].derived])
+)
+_FIELDS = {column: (field, kind) for column, field, kind in SCHEMA}
+
+
+class FieldValidationError(ValueError):
+    # one message per offending field, so the client can fix them all at once
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(f"{field}: {message}" for field, message in errors.items()))
+
+
+class HouseFeatures:
+    """
+    One prediction request's inputs as typed attributes (the form field
+    names, e.g. ``Gr_Liv_Area``), plus ``row``: a (1, n_features) float64
+    array in FEATURE_COLUMNS order that ``parse`` fills while converting
+    the fields, computing derived features (e.g. ``year_since_remod``)
+    from their raw inputs, so the predict path never builds a DataFrame.
+    """
+
+    __slots__ = tuple(field for _, field, _ in SCHEMA) + ('row',)
+
+    @classmethod
+    def parse(cls, values, out=None):
+        # values: any mapping of field name -> string/number (request.form,
+        # a parsed query string, a JSON object); raises FieldValidationError
+        record = cls.__new__(cls)
+        row = np.empty((1, len(MODEL_FEATURES)), dtype=np.float64) if out is None else out
+        errors = {}
+
+        def lookup(column):
+            field, kind = _FIELDS[column]
+            raw = values.get(field)
+            if raw is None or raw == '':
+                if FEATURES[column].derived:
+                    # computed from its inputs instead
+                    return None
+                errors[field] = "missing"
+                return math.nan
+            try:
+                value = kind(raw)
+                # int(2.5) truncates; a JSON 2.5 is as wrong as the string '2.5'
+                if kind is int and not isinstance(raw, str) and not float(raw).is_integer():
+                    raise ValueError(raw)
+            except (TypeError, ValueError, OverflowError):
+                errors[field] = f"expected {'an integer' if kind is int else 'a number'}, got {raw!r}"
+                return math.nan
+            if kind is float and math.isinf(value):
+                errors[field] = "must be finite"
+                return math.nan
+            setattr(record, field, value)
+            return value
+
+        row[0] = resolve(lookup, MODEL_FEATURES)
+        if errors:
+            raise FieldValidationError(errors)
+        record.row = row
+        return record
+
+    def as_dict(self):
+        return {field: getattr(self, field) for _, field, _ in SCHEMA if hasattr(self, field)}
+
+    def to_frame(self):
+        # for the paths that still need a DataFrame (micro batching, CustomData users)
+        import pandas as pd
+
+        return pd.DataFrame(self.row, columns=MODEL_FEATURES)
+
+    def __repr__(self):
+        return f"HouseFeatures({self.as_dict()})"
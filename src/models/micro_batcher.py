@@ -0,0 +1,162 @@
+import sys
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.exception import CustomException
+from src.logger import logging
+from src.models.predict_model import PredictPipeline, FEATURE_COLUMNS
+
+
+@dataclass
+class MicroBatcherConfig:
+    # flush as soon as this many rows are waiting ...
+    max_batch_rows: int = 256
+    # ... or once the oldest waiting request is this old
+    max_wait_ms: float = 3.0
+
+
+class BatchStats:
+    # achieved batch sizes, bucketed by powers of two (1, 2, 4, ... rows)
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+        self.max_rows = 0
+        self.buckets = {}
+
+    def record(self, n_requests, n_rows):
+        bucket = 1 << max(int(n_rows) - 1, 0).bit_length()
+        with self._lock:
+            self.batches += 1
+            self.requests += n_requests
+            self.rows += n_rows
+            self.max_rows = max(self.max_rows, n_rows)
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "rows": self.rows,
+                "max_batch_rows": self.max_rows,
+                "mean_batch_rows": self.rows / self.batches if self.batches else 0.0,
+                "mean_requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+                "batch_rows_histogram": {f"<={k}": v for k, v in sorted(self.buckets.items())},
+            }
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent prediction requests into one vectorized
+    ``PredictPipeline.predict_batch`` call. Callers block on ``predict`` (or
+    hold the future from ``submit``) while a single background thread
+    collects requests until ``max_batch_rows`` rows are waiting or
+    ``max_wait_ms`` has passed, then fans the results back out.
+    """
+
+    _STOP = object()
+
+    def __init__(self, pipeline=None, config=None):
+        self.pipeline = pipeline or PredictPipeline()
+        self.config = config or MicroBatcherConfig()
+        self.stats = BatchStats()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="micro-batcher", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        # requests already queued are still served before the thread exits
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(self._STOP)
+                self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, features):
+        if self._thread is None:
+            self.start()
+        future = Future()
+        self._queue.put((features, future))
+        return future
+
+    def predict(self, features, timeout=None):
+        return self.submit(features).result(timeout)
+
+    def _collect(self, first):
+        batch = [first]
+        n_rows = len(first[0])
+        deadline = time.monotonic() + self.config.max_wait_ms / 1000.0
+        stop = False
+        while n_rows < self.config.max_batch_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                stop = True
+                break
+            batch.append(item)
+            n_rows += len(item[0])
+        return batch, n_rows, stop
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is self._STOP:
+                break
+            batch, n_rows, stop = self._collect(first)
+            self._score(batch, n_rows)
+            if stop:
+                break
+
+        # drain anything that raced with stop()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self._STOP:
+                self._score([item], len(item[0]))
+
+    def _score(self, batch, n_rows):
+        try:
+            frames = [features for features, _ in batch]
+            if len(frames) == 1:
+                features = frames[0]
+            elif not any(hasattr(frame, 'columns') for frame in frames):
+                # HouseFeatures rows from the form fast path
+                features = np.concatenate(frames)
+            else:
+                import pandas as pd
+
+                features = pd.concat([frame if hasattr(frame, 'columns') else pd.DataFrame(frame, columns=FEATURE_COLUMNS)
+                                      for frame in frames], ignore_index=True)
+            preds = self.pipeline.predict_batch(features)
+        except Exception as e:
+            logging.info(f"micro batch of {n_rows} rows failed: {e}")
+            for _, future in batch:
+                future.set_exception(e if isinstance(e, CustomException) else CustomException(e, sys))
+            return
+
+        self.stats.record(len(batch), n_rows)
+        offsets = np.cumsum([len(features) for features, _ in batch])[:-1]
+        for (_, future), part in zip(batch, np.split(preds, offsets)):
+            future.set_result(part)
@@ -0,0 +1,564 @@
+import os
+import sys
+import json
+import time
+import queue
+import random
+import shutil
+import hashlib
+import argparse
+import threading
+import contextlib
+from datetime import datetime
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from src.exception import CustomException
+from src.logger import logging
+from src import load_object
+
+
+@dataclass
+class ModelRegistryConfig:
+    # either a dill pickle or a .npy artifact directory (see load_object)
+    model_path: str = field(default_factory=lambda: os.environ.get(
+        'AMES_MODEL_PATH', os.path.join('models', 'model.pkl')))
+    preprocessor_path: str = field(default_factory=lambda: os.environ.get(
+        'AMES_PREPROCESSOR_PATH', os.path.join('models', 'preprocessor.pkl')))
+    # how often (seconds) the artifact files are stat()-ed for changes,
+    # 0 means check on every call and None disables hot reload entirely
+    check_interval: float = 1.0
+    # versioned registry directory (see VersionedModelRegistry); when set it
+    # replaces the single model_path/preprocessor_path pair
+    registry_dir: str = field(default_factory=lambda: os.environ.get('AMES_REGISTRY_DIR'))
+
+
+def file_digest(file_path, chunk_size=1 << 20):
+    # sha256 of the file contents, used to tell a real change from a touch
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file_obj:
+        for chunk in iter(lambda: file_obj.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _Artifact:
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.obj = None
+        self.stat_key = None
+        self.digest = None
+
+    def _watched_path(self):
+        # array artifact directories are rewritten together with their
+        # manifest (which records every array's sha256), so watch that
+        if os.path.isdir(self.file_path):
+            return os.path.join(self.file_path, 'manifest.json')
+        return self.file_path
+
+    def load_if_changed(self):
+        # returns (obj, stat_key, digest) loaded from a changed file, or None
+        # when the file is unchanged; nothing is published until commit()
+        watched_path = self._watched_path()
+        stat = os.stat(watched_path)
+        stat_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if self.obj is not None and stat_key == self.stat_key:
+            return None
+
+        digest = file_digest(watched_path)
+        if self.obj is not None and digest == self.digest:
+            # file was touched or copied over with identical contents
+            self.stat_key = stat_key
+            return None
+
+        return load_object(file_path=self.file_path), stat_key, digest
+
+    def commit(self, loaded):
+        self.obj, self.stat_key, self.digest = loaded
+        logging.info(f"loaded artifact {self.file_path} ({self.digest[:12]})")
+
+
+class ModelRegistry:
+    """
+    Keeps the fitted model and preprocessor resident for the lifetime of the
+    process. Artifacts are loaded on first use (or by ``preload``) and are
+    reloaded only when the file on disk actually changes.
+    """
+
+    # a single pair: no canary or shadow to route to
+    routes_traffic = False
+
+    def __init__(self, config=None):
+        self.config = config or ModelRegistryConfig()
+        self._model = _Artifact(self.config.model_path)
+        self._preprocessor = _Artifact(self.config.preprocessor_path)
+        self._lock = threading.Lock()
+        self._last_check = None
+        # (version, model, preprocessor), replaced as one reference so a
+        # reader never pairs a new model with an old preprocessor
+        self._pair = None
+
+    def preload(self):
+        return self.get()
+
+    def _due_for_check(self):
+        if self._last_check is None:
+            return True
+        if self.config.check_interval is None:
+            return False
+        return time.monotonic() - self._last_check >= self.config.check_interval
+
+    def _refresh(self):
+        # load whatever changed into temporaries first; if either load fails
+        # the pair in use stays untouched
+        model_update = self._model.load_if_changed()
+        preprocessor_update = self._preprocessor.load_if_changed()
+        if model_update is None and preprocessor_update is None and self._pair is not None:
+            return
+        if model_update is not None:
+            self._model.commit(model_update)
+        if preprocessor_update is not None:
+            self._preprocessor.commit(preprocessor_update)
+        version = f"{self._model.digest[:12]}-{self._preprocessor.digest[:12]}"
+        self._pair = (version, self._model.obj, self._preprocessor.obj)
+
+    def get(self):
+        try:
+            if self._due_for_check():
+                with self._lock:
+                    if self._due_for_check():
+                        try:
+                            self._refresh()
+                        except Exception as e:
+                            if self._pair is None:
+                                raise
+                            # e.g. a pair being rewritten: keep serving the
+                            # loaded one and retry at the next check
+                            logging.info(f"artifact reload failed, keeping {self._pair[0]}: {e}")
+                        self._last_check = time.monotonic()
+            _, model, preprocessor = self._pair
+            return model, preprocessor
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @property
+    def version(self):
+        # identifies the currently loaded model/preprocessor pair
+        return self._pair[0] if self._pair is not None else None
+
+    def select(self, routing_key=None):
+        self.get()
+        return self._pair
+
+    def submit_shadow(self, features, preds):
+        pass
+
+
+REGISTRY_MANIFEST = 'manifest.json'
+# versions kept by publish_version, on top of every routed one
+DEFAULT_KEEP_VERSIONS = 10
+
+
+def read_registry_manifest(root):
+    path = os.path.join(root, REGISTRY_MANIFEST)
+    if not os.path.exists(path):
+        return {"versions": {}, "active": None, "canary": None, "canary_percent": 0.0, "shadow": None}
+    with open(path) as file_obj:
+        return json.load(file_obj)
+
+
+@contextlib.contextmanager
+def _manifest_lock(root):
+    # serializes read-modify-write of the manifest between processes
+    # (a training run and an incremental refresh publishing at once)
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, f"{REGISTRY_MANIFEST}.lock"), "a+") as lock_file:
+        try:
+            import fcntl
+        except ImportError:
+            import msvcrt
+
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _write_registry_manifest(root, manifest):
+    # readers only ever see the old or the new manifest, never a partial one
+    os.makedirs(root, exist_ok=True)
+    tmp_path = os.path.join(root, f"{REGISTRY_MANIFEST}.tmp")
+    with open(tmp_path, "w") as file_obj:
+        json.dump(manifest, file_obj, indent=2)
+    os.replace(tmp_path, os.path.join(root, REGISTRY_MANIFEST))
+
+
+def _prune_versions(manifest, keep):
+    # drops all but the `keep` newest versions from the manifest (routed
+    # ones always stay) and returns the dropped names; their directories
+    # are removed only once the manifest no longer lists them
+    routed = {manifest.get(role) for role in ("active", "canary", "shadow")}
+    by_age = sorted(manifest["versions"], key=lambda v: int(v[1:]) if v[1:].isdigit() else -1, reverse=True)
+    dropped = [version for version in by_age[keep:] if version not in routed]
+    for version in dropped:
+        del manifest["versions"][version]
+    return dropped
+
+
+def publish_version(root, model_path, preprocessor_path, metrics=None, activate=False,
+                    keep=DEFAULT_KEEP_VERSIONS):
+    """
+    Copies a model/preprocessor pair into a new immutable ``root/vNNNN``
+    directory and records it in the manifest. The first version published
+    becomes active; later ones only when ``activate`` is set. Only the
+    ``keep`` newest versions plus the active/canary/shadow ones are kept
+    (None keeps everything).
+    """
+    try:
+        with _manifest_lock(root):
+            manifest = read_registry_manifest(root)
+            numbers = [int(v[1:]) for v in manifest["versions"] if v[1:].isdigit()]
+            version = f"v{max(numbers, default=0) + 1:04d}"
+
+            staging = os.path.join(root, f".{version}.tmp")
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            entry = {"created": datetime.now().isoformat(timespec="seconds"), "metrics": metrics or {}}
+            for kind, source in (("model", model_path), ("preprocessor", preprocessor_path)):
+                if os.path.isdir(source):
+                    name = kind
+                    shutil.copytree(source, os.path.join(staging, name))
+                else:
+                    name = kind + os.path.splitext(source)[1]
+                    shutil.copy2(source, os.path.join(staging, name))
+                entry[kind] = name
+                entry[f"{kind}_sha256"] = file_digest(_Artifact(os.path.join(staging, name))._watched_path())
+            os.rename(staging, os.path.join(root, version))
+
+            manifest["versions"][version] = entry
+            if activate or manifest.get("active") is None:
+                manifest["active"] = version
+            dropped = _prune_versions(manifest, keep) if keep is not None else []
+            _write_registry_manifest(root, manifest)
+            for old_version in dropped:
+                shutil.rmtree(os.path.join(root, old_version), ignore_errors=True)
+
+        logging.info(f"published model version {version} to {root}"
+                     + (f", removed {dropped}" if dropped else ""))
+        return version
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def prune_versions(root, keep=DEFAULT_KEEP_VERSIONS):
+    # same retention as publish_version, for an existing registry
+    with _manifest_lock(root):
+        manifest = read_registry_manifest(root)
+        dropped = _prune_versions(manifest, keep)
+        if dropped:
+            _write_registry_manifest(root, manifest)
+        for version in dropped:
+            shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+    logging.info(f"pruned model versions {dropped} from {root}")
+    return dropped
+
+
+def set_routing(root, **changes):
+    # changes: active, canary, canary_percent, shadow (None clears canary/shadow)
+    with _manifest_lock(root):
+        manifest = read_registry_manifest(root)
+        for key, value in changes.items():
+            if key not in ("active", "canary", "canary_percent", "shadow"):
+                raise ValueError(f"unknown routing field: {key}")
+            if key != "canary_percent" and value is not None and value not in manifest["versions"]:
+                raise ValueError(f"unknown model version: {value}")
+            if key == "canary_percent" and not 0 <= float(value) <= 100:
+                raise ValueError("canary_percent must be between 0 and 100")
+            if key == "active" and value is None:
+                raise ValueError("active version cannot be cleared")
+            manifest[key] = value
+        _write_registry_manifest(root, manifest)
+    logging.info(f"registry routing changed: {changes}")
+    return manifest
+
+
+@dataclass(frozen=True)
+class _RoutingState:
+    active: str
+    canary: str
+    canary_percent: float
+    shadow: str
+    # version -> (model, preprocessor) for every version routed to
+    pairs: dict
+
+
+class ShadowScorer:
+    """
+    Scores requests with the shadow version on a background thread and
+    keeps running agreement stats against what was served. Requests that
+    do not fit the bounded queue are dropped rather than delaying anyone.
+    """
+
+    def __init__(self, max_pending=1000):
+        self._queue = queue.Queue(max_pending)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._reset(None)
+
+    def _reset(self, version):
+        self.version = version
+        self.scored = 0
+        self.dropped = 0
+        self.errors = 0
+        self._abs_diff_sum = 0.0
+        self._max_abs_diff = 0.0
+
+    def submit(self, version, model, preprocessor, features, preds):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait((version, model, preprocessor, features, np.asarray(preds)))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _run(self):
+        while True:
+            version, model, preprocessor, features, served = self._queue.get()
+            try:
+                from src.models.compiled_model import transform_input
+
+                shadow_preds = model.predict(transform_input(preprocessor, features))
+                abs_diff = np.abs(np.asarray(shadow_preds, dtype=np.float64) - served)
+                with self._lock:
+                    if version != self.version:
+                        self._reset(version)
+                    self.scored += len(abs_diff)
+                    self._abs_diff_sum += float(abs_diff.sum())
+                    self._max_abs_diff = max(self._max_abs_diff, float(abs_diff.max()))
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                logging.info(f"shadow scoring with {version} failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "shadow_version": self.version,
+                "rows_scored": self.scored,
+                "dropped_requests": self.dropped,
+                "errors": self.errors,
+                "mean_abs_diff": self._abs_diff_sum / self.scored if self.scored else None,
+                "max_abs_diff": self._max_abs_diff if self.scored else None,
+            }
+
+
+class VersionedModelRegistry:
+    """
+    Serves from a registry directory of immutable ``vNNNN`` versions plus a
+    manifest naming the active version, an optional canary (with the
+    percentage of routed traffic it gets) and an optional shadow. Every
+    version the manifest routes to is kept resident; editing the manifest
+    (``set_routing``) switches all of them at once without a restart: new
+    versions are loaded first and then published in one reference swap.
+    """
+
+    def __init__(self, root, check_interval=1.0):
+        self.root = root
+        self.check_interval = check_interval
+        self._state = None
+        self._stat_key = None
+        self._lock = threading.Lock()
+        self._last_check = None
+        self.shadow_scorer = ShadowScorer()
+
+    def _due_for_check(self):
+        if self._last_check is None:
+            return True
+        if self.check_interval is None:
+            return False
+        return time.monotonic() - self._last_check >= self.check_interval
+
+    def _load_pair(self, version, entry):
+        version_dir = os.path.join(self.root, version)
+        model = load_object(os.path.join(version_dir, entry["model"]))
+        preprocessor = load_object(os.path.join(version_dir, entry["preprocessor"]))
+        logging.info(f"loaded model version {version}")
+        return model, preprocessor
+
+    def _refresh(self):
+        stat = os.stat(os.path.join(self.root, REGISTRY_MANIFEST))
+        stat_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if self._state is not None and stat_key == self._stat_key:
+            return
+
+        manifest = read_registry_manifest(self.root)
+        if manifest.get("active") is None:
+            raise ValueError(f"no active model version in {self.root}")
+        routed = {manifest["active"], manifest.get("canary"), manifest.get("shadow")} - {None}
+        loaded = self._state.pairs if self._state is not None else {}
+        pairs = {
+            version: loaded.get(version) or self._load_pair(version, manifest["versions"][version])
+            for version in routed
+        }
+        self._state = _RoutingState(
+            active=manifest["active"],
+            canary=manifest.get("canary"),
+            canary_percent=float(manifest.get("canary_percent") or 0.0),
+            shadow=manifest.get("shadow"),
+            pairs=pairs,
+        )
+        self._stat_key = stat_key
+        logging.info(f"registry routing: active={self._state.active} canary={self._state.canary} "
+                     f"({self._state.canary_percent}%) shadow={self._state.shadow}")
+
+    def _current(self):
+        try:
+            if self._due_for_check():
+                with self._lock:
+                    if self._due_for_check():
+                        try:
+                            self._refresh()
+                        except Exception as e:
+                            if self._state is None:
+                                raise
+                            # e.g. a broken canary/shadow version: keep
+                            # routing as before and retry at the next check
+                            logging.info(f"registry reload failed, keeping active={self._state.active}: {e}")
+                        self._last_check = time.monotonic()
+            return self._state
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def preload(self):
+        return self.get()
+
+    def get(self):
+        state = self._current()
+        return state.pairs[state.active]
+
+    @property
+    def version(self):
+        return self._state.active if self._state is not None else None
+
+    @property
+    def routes_traffic(self):
+        # whether requests need select()/submit_shadow rather than get()
+        state = self._current()
+        return bool(state.canary or state.shadow)
+
+    def select(self, routing_key=None):
+        # (version, model, preprocessor) for one request: the canary for
+        # canary_percent of traffic (sticky per routing_key when given)
+        state = self._current()
+        version = state.active
+        if state.canary and state.canary_percent > 0:
+            if routing_key is None:
+                draw = random.random() * 100
+            else:
+                draw = int(hashlib.sha1(str(routing_key).encode()).hexdigest()[:8], 16) % 10000 / 100
+            if draw < state.canary_percent:
+                version = state.canary
+        return (version, *state.pairs[version])
+
+    def submit_shadow(self, features, preds):
+        state = self._state
+        if state is not None and state.shadow:
+            self.shadow_scorer.submit(state.shadow, *state.pairs[state.shadow], features, preds)
+
+    def routing(self):
+        state = self._current()
+        return {
+            "active": state.active,
+            "canary": state.canary,
+            "canary_percent": state.canary_percent,
+            "shadow": state.shadow,
+            "resident_versions": sorted(state.pairs),
+            "shadow_stats": self.shadow_scorer.stats(),
+        }
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_registry():
+    # process-wide registry shared by every PredictPipeline instance
+    global _default_registry
+    if _default_registry is None:
+        with _default_registry_lock:
+            if _default_registry is None:
+                config = ModelRegistryConfig()
+                if config.registry_dir:
+                    _default_registry = VersionedModelRegistry(config.registry_dir, config.check_interval)
+                else:
+                    _default_registry = ModelRegistry(config)
+    return _default_registry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.models.model_registry")
+    parser.add_argument("--root", default=os.environ.get('AMES_REGISTRY_DIR', os.path.join('models', 'registry')))
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("list", help="show versions and routing")
+
+    publish = subparsers.add_parser("publish", help="add a model/preprocessor pair as a new version")
+    publish.add_argument("--model", default=os.path.join('models', 'model.pkl'))
+    publish.add_argument("--preprocessor", default=os.path.join('models', 'preprocessor.pkl'))
+    publish.add_argument("--activate", action="store_true")
+    publish.add_argument("--keep", type=int, default=DEFAULT_KEEP_VERSIONS,
+                         help="versions to keep besides the routed ones")
+
+    prune = subparsers.add_parser("prune", help="remove old unrouted versions")
+    prune.add_argument("--keep", type=int, default=DEFAULT_KEEP_VERSIONS)
+
+    activate = subparsers.add_parser("activate", help="make a version the active one")
+    activate.add_argument("version")
+
+    canary = subparsers.add_parser("canary", help="route a share of traffic to a version")
+    canary.add_argument("version", help="version, or 'none' to stop the canary")
+    canary.add_argument("--percent", type=float, default=5.0)
+
+    shadow = subparsers.add_parser("shadow", help="score a version off the request path")
+    shadow.add_argument("version", help="version, or 'none' to stop shadow scoring")
+
+    args = parser.parse_args(argv)
+    if args.command == "publish":
+        print(publish_version(args.root, args.model, args.preprocessor, activate=args.activate, keep=args.keep))
+    elif args.command == "prune":
+        print(f"removed: {prune_versions(args.root, keep=args.keep)}")
+    elif args.command == "activate":
+        set_routing(args.root, active=args.version)
+    elif args.command == "canary":
+        version = None if args.version == "none" else args.version
+        set_routing(args.root, canary=version, canary_percent=args.percent if version else 0.0)
+    elif args.command == "shadow":
+        set_routing(args.root, shadow=None if args.version == "none" else args.version)
+
+    manifest = read_registry_manifest(args.root)
+    for version, entry in sorted(manifest["versions"].items()):
+        roles = [role for role in ("active", "canary", "shadow") if manifest.get(role) == version]
+        print(f"{version}  {entry['created']}  {entry.get('metrics', {})}  {' '.join(roles)}")
+    if manifest.get("canary"):
+        print(f"canary traffic: {manifest['canary_percent']}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,105 @@
+import io
 import sys
-import pandas as pd
+import json
+import argparse
 import numpy as np
+# pandas is imported where it is used: the web app imports this module at
+# startup, but form requests (HouseFeatures rows) never need it
 from src.exception import CustomException
-from src import load_object
 from src.logger import logging
+from src.instrumentation import span
+from src.models.model_registry import get_registry
+from src.features.feature_spec import FEATURES, FORM_COLUMNS, MODEL_FEATURES, compute_features, required_columns
+
+# The feature columns the preprocessor was fitted on, in order (the
+# feature set selected by AMES_FEATURE_SET)
+FEATURE_COLUMNS = MODEL_FEATURES
+
+
+def validate_features(df):
+    # Checks a batch of records column-wise and returns a float frame with
+    # exactly FEATURE_COLUMNS. Derived columns a record does not carry are
+    # computed from their raw inputs (FORM_COLUMNS). Missing values are
+    # allowed (the imputer fills them), anything that is present but not
+    # numeric is rejected.
+    import pandas as pd
+
+    missing = [
+        col for col in FEATURE_COLUMNS
+        if col not in df.columns and not all(raw in df.columns for raw in required_columns([col]))
+    ]
+    if missing:
+        raise ValueError(f"missing feature columns: {missing} (or their inputs from {FORM_COLUMNS})")
+
+    used = [col for col in dict.fromkeys(FEATURE_COLUMNS + FORM_COLUMNS) if col in df.columns]
+    features = df[used].apply(pd.to_numeric, errors="coerce")
+    invalid = features.isna() & df[used].notna()
+    if invalid.values.any():
+        bad = {
+            col: [int(i) for i in np.flatnonzero(invalid[col].values)[:5]]
+            for col in used if invalid[col].any()
+        }
+        raise ValueError(f"non-numeric values (column: row indices): {bad}")
+
+    return compute_features(features.astype("float64"), FEATURE_COLUMNS)
+
+
+def parse_records(content_type, body):
+    # JSON array of records (or {"records": [...]}), CSV, or NDJSON bodies
+    import pandas as pd
+
+    content_type = (content_type or '').split(';')[0].strip().lower()
+
+    if content_type in ('text/csv', 'application/csv'):
+        return pd.read_csv(io.StringIO(body))
+
+    if content_type in ('application/x-ndjson', 'application/jsonl'):
+        records = [json.loads(line) for line in body.splitlines() if line.strip()]
+    else:
+        payload = json.loads(body)
+        records = payload.get('records') if isinstance(payload, dict) else payload
+
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        raise ValueError("expected a JSON array of feature records")
+    return pd.DataFrame.from_records(records)
+
+
+def parse_features(content_type, body, max_rows=None):
+    # request body -> validated feature frame; every client error is a
+    # ValueError (json.JSONDecodeError and pandas parser errors included)
+    with span("request_parse"):
+        records = parse_records(content_type, body)
+        if records.empty:
+            raise ValueError("no records in request body")
+        if max_rows is not None and len(records) > max_rows:
+            raise ValueError(f"batch exceeds {max_rows} rows")
+        return validate_features(records)
 
 
 class PredictPipeline:
-    def __init__(self):
-        pass
+    def __init__(self, registry=None):
+        # artifacts live in the process-wide registry, so creating a
+        # pipeline per request no longer deserializes the model
+        self.registry = registry or get_registry()
+
+    @property
+    def model_version(self):
+        # identifies the loaded model/preprocessor pair, reloading first if
+        # the artifacts changed on disk
+        self.registry.get()
+        return self.registry.version
 
     def predict(self,features):
         # logging.info('user data is going for transformation')
         try:
-            model_path='models/model.pkl'
-            preprocessor_path='models/preprocessor.pkl'
-            model=load_object(file_path=model_path)
-            preprocessor=load_object(file_path=preprocessor_path)
+            model, preprocessor = self.registry.get()
             
             # The preprocessor handles all transformation (log, scaling, imputation)
-            data_scaled=preprocessor.transform(features) 
+            with span("preprocessor_transform"):
+                data_scaled=preprocessor.transform(features) 
             
-            preds= (model.predict(data_scaled),2)
+            with span("inference"):
+                preds= (model.predict(data_scaled),2)
             logging.info("data is predicted")
             return preds
         
@@ -30,52 +108,158 @@ class PredictPipeline:
             print(f"Prediction Error in PredictPipeline: {e}") 
             raise CustomException(e,sys)
 
+    def predict_batch(self, features):
+        # One transform + predict over the whole batch; returns a 1-D array
+        # with one prediction per input row. ``features`` is a frame with
+        # FEATURE_COLUMNS or a 2-D float array in that order, e.g.
+        # HouseFeatures.row, which skips pandas entirely.
+        try:
+            from src.models.compiled_model import transform_input
+
+            model, preprocessor = self.registry.get()
+
+            with span("preprocessor_transform"):
+                data_scaled = transform_input(preprocessor, features)
+            with span("inference"):
+                preds = model.predict(data_scaled)
+            logging.info(f"batch of {len(preds)} rows is predicted")
+            return preds
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+    def predict_routed(self, features, routing_key=None):
+        # Like predict_batch, but honours the registry's canary split and
+        # hands the request to the shadow scorer; returns (preds, version).
+        try:
+            from src.models.compiled_model import transform_input
+
+            version, model, preprocessor = self.registry.select(routing_key)
+
+            with span("preprocessor_transform"):
+                data_scaled = transform_input(preprocessor, features)
+            with span("inference"):
+                preds = model.predict(data_scaled)
+            self.registry.submit_shadow(features, preds)
+            logging.info(f"batch of {len(preds)} rows is predicted by {version}")
+            return preds, version
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+def warm_up(registry=None):
+    # loads the artifacts and runs one throwaway prediction, so the lazy
+    # imports and first-call costs are paid before the server reports ready
+    import pandas as pd
+
+    pipeline = PredictPipeline(registry)
+    pipeline.registry.preload()
+    pipeline.predict_batch(pd.DataFrame(np.zeros((1, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS))
+    logging.info(f"warm-up done, model version {pipeline.model_version}")
+    return pipeline.model_version
+
 
 class CustomData:
-    def __init__(self,
-        Overall_Qual: int,
-        Gr_Liv_Area: int,
-        Garage_Cars: float,
-        Garage_Area: float,
-        First_Flr_SF: int,
-        Total_Bsmt_SF: float,
-        Lot_Area: int,
-        BsmtFin_SF_1: float,
-        Full_Bath: int,
-        year_since_remod: int):
-
-        # Initializing instance attributes with the RAW, UNTRANSFORMED values.
-        # CRITICAL FIX: Removed np.log1p() calls here. The preprocessor handles logging.
-        self.Overall_Qual = Overall_Qual
-        self.Gr_Liv_Area = Gr_Liv_Area         
-        self.Garage_Cars = Garage_Cars
-        self.Garage_Area = Garage_Area
-        self.First_Flr_SF = First_Flr_SF       
-        self.Total_Bsmt_SF = Total_Bsmt_SF
-        self.Lot_Area = Lot_Area
-        self.BsmtFin_SF_1 = BsmtFin_SF_1       
-        self.Full_Bath = Full_Bath
-        self.year_since_remod = year_since_remod
+    def __init__(self, **fields):
+        # RAW, UNTRANSFORMED values keyed by form field (FORM_FIELDS, e.g.
+        # Gr_Liv_Area=1500, Yr_Sold=2010, Year_Remod_Add=2000); the
+        # preprocessor handles logging. A derived feature may be passed
+        # directly instead of its inputs (year_since_remod=4).
+        for field, value in fields.items():
+            setattr(self, field, value)
 
     def get_data_as_data_frame(self):
+        import pandas as pd
+
         try:
-            # Keys MUST match the 10 feature names expected by your reduced preprocessor/model
-            custom_data_input_dict = {
-                "Overall Qual": [self.Overall_Qual],
-                "Gr Liv Area": [self.Gr_Liv_Area],
-                "Garage Cars": [self.Garage_Cars],
-                "Garage Area": [self.Garage_Area],
-                "1st Flr SF": [self.First_Flr_SF], 
-                "Total Bsmt SF": [self.Total_Bsmt_SF],
-                "Lot Area": [self.Lot_Area],
-                "BsmtFin SF 1": [self.BsmtFin_SF_1], 
-                "Full Bath": [self.Full_Bath],
-                "year_since_remod": [self.year_since_remod]
+            # column names and their attribute names come from the feature spec
+            columns = dict.fromkeys(FEATURE_COLUMNS + FORM_COLUMNS)
+            given = {
+                column: [getattr(self, FEATURES[column].field)]
+                for column in columns if hasattr(self, FEATURES[column].field)
             }
-            
+            try:
+                df = compute_features(pd.DataFrame(given), FEATURE_COLUMNS)
+            except KeyError as missing:
+                raise ValueError(f"CustomData is missing an input: {missing}")
+
             logging.info("the data frame is created")
 
-            return pd.DataFrame(custom_data_input_dict)
+            return df
 
         except Exception as e:
             raise CustomException(e, sys)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.models.predict_model")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    score = subparsers.add_parser("score", help="score a CSV/parquet file in chunks")
+    score.add_argument("--input", required=True)
+    score.add_argument("--output", required=True)
+    score.add_argument("--chunk-size", type=int, default=50000)
+    score.add_argument("--workers", type=int, default=0)
+    score.add_argument("--id-column", default=None,
+                       help="input column copied next to each prediction")
+    score.add_argument("--model", default="models/model.pkl")
+    score.add_argument("--preprocessor", default="models/preprocessor.pkl")
+
+    compile_ = subparsers.add_parser(
+        "compile", help="export the fitted pipeline as a pure-NumPy engine")
+    compile_.add_argument("--output", default="models/compiled_model.npz")
+    compile_.add_argument("--model", default="models/model.pkl")
+    compile_.add_argument("--preprocessor", default="models/preprocessor.pkl")
+    compile_.add_argument("--check-data", default=None,
+                          help="CSV with the feature columns to verify parity on")
+
+    export = subparsers.add_parser(
+        "export", help="write model/preprocessor as memory-mappable .npy artifacts")
+    export.add_argument("--model", default="models/model.pkl")
+    export.add_argument("--preprocessor", default="models/preprocessor.pkl")
+    export.add_argument("--model-output", default="models/model")
+    export.add_argument("--preprocessor-output", default="models/preprocessor")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "score":
+        from src.models.bulk_score import BulkScoreConfig, BulkScorer
+
+        n_rows = BulkScorer(BulkScoreConfig(
+            input_path=args.input,
+            output_path=args.output,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            id_column=args.id_column,
+            model_path=args.model,
+            preprocessor_path=args.preprocessor,
+        )).run()
+        print(f"scored {n_rows} rows -> {args.output}")
+
+    elif args.command == "compile":
+        import pandas as pd
+        from src import load_object
+        from src.models.compiled_model import CompiledPipeline, check_parity
+
+        model = load_object(file_path=args.model)
+        preprocessor = load_object(file_path=args.preprocessor)
+        compiled = CompiledPipeline.from_sklearn(preprocessor, model)
+        if args.check_data:
+            max_diff = check_parity(compiled, preprocessor, model, pd.read_csv(args.check_data))
+            print(f"parity ok (max abs diff {max_diff})")
+        compiled.save(args.output)
+        print(f"compiled {len(compiled.forest.roots)} trees -> {args.output}")
+
+    elif args.command == "export":
+        from src import load_object
+        from src.models.compiled_model import save_array_artifact
+
+        save_array_artifact(args.model_output, load_object(file_path=args.model))
+        save_array_artifact(args.preprocessor_output, load_object(file_path=args.preprocessor))
+        print(f"exported {args.model_output} and {args.preprocessor_output}")
+
+
+if __name__ == "__main__":
+    main()
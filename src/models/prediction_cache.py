@@ -0,0 +1,123 @@
+import math
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.models.predict_model import FEATURE_COLUMNS
+
+
+@dataclass
+class PredictionCacheConfig:
+    # each entry is a 10-float tuple plus one float, roughly 0.5 KB
+    max_entries: int = 100000
+    # seconds an entry stays valid; None keeps entries until evicted
+    ttl: float = 3600.0
+
+
+def canonical_key(values):
+    # the same listing must map to the same key however it was typed in:
+    # ints and floats compare equal, -0.0 is 0.0 and every NaN is None
+    key = []
+    for value in values:
+        value = float(value)
+        if math.isnan(value):
+            key.append(None)
+        else:
+            key.append(value + 0.0)
+    return tuple(key)
+
+
+class PredictionCache:
+    """
+    LRU + TTL cache of predictions keyed on the canonical feature tuple.
+    Entries are tied to the registry's model version: the first lookup
+    after the model or preprocessor changes on disk drops the whole cache.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or PredictionCacheConfig()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _check_version(self, version):
+        # caller holds the lock
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def lookup(self, keys, version):
+        # returns a list with the cached value or None for every key
+        now = time.monotonic()
+        found = []
+        with self._lock:
+            self._check_version(version)
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] is not None and entry[1] < now:
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    found.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    found.append(entry[0])
+        return found
+
+    def store(self, keys, values, version):
+        expires_at = time.monotonic() + self.config.ttl if self.config.ttl is not None else None
+        with self._lock:
+            if version != self._version:
+                # the model changed while these were being computed
+                return
+            for key, value in zip(keys, values):
+                self._entries[key] = (float(value), expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.config.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def predict(self, features, compute, version):
+        # features: frame with FEATURE_COLUMNS or a 2-D array in that order;
+        # compute(features) -> 1-D array. Only the rows that miss the cache
+        # are passed to compute, in one call.
+        is_frame = hasattr(features, 'columns')
+        values = features[FEATURE_COLUMNS].to_numpy(dtype=np.float64) if is_frame else np.asarray(features, dtype=np.float64)
+        keys = [canonical_key(row) for row in values]
+        found = self.lookup(keys, version)
+
+        missing = [i for i, value in enumerate(found) if value is None]
+        preds = np.array([np.nan if value is None else value for value in found], dtype=np.float64)
+        if missing:
+            computed = np.asarray(compute(features.iloc[missing] if is_frame else values[missing]), dtype=np.float64)
+            preds[missing] = computed
+            self.store([keys[i] for i in missing], computed, version)
+        return preds
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.config.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "model_version": self._version,
+            }
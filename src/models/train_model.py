@@ -1,7 +1,11 @@
 import pandas as pd
+import numpy as np
 import os 
 import sys
-from dataclasses import dataclass
+import json
+import math
+import hashlib
+from dataclasses import dataclass, field
 
 # from catboost import CatBostRegressor
 from sklearn.ensemble import (
@@ -12,6 +16,7 @@ from sklearn.ensemble import (
 
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import r2_score
+from sklearn.model_selection import ParameterSampler, train_test_split
 
 from sklearn.neighbors import KNeighborsRegressor
 from sklearn.tree import DecisionTreeRegressor
@@ -21,27 +26,251 @@ from src.exception import CustomException
 from src.logger import logging
 
 from src import save_object,evaluate_model
+from src.models.cross_validation import CrossValidationConfig, cross_validate_models
+
+
+# estimator, hyperparameter space, and whether the search budget is spent as
+# trees (n_estimators) or as training rows
+SEARCH_SPACES = {
+    "Random Forest": (
+        RandomForestRegressor(random_state=42),
+        {"max_depth": [None, 8, 12, 16, 24], "min_samples_leaf": [1, 2, 4, 8],
+         "max_features": [1.0, 0.7, 0.5, "sqrt"]},
+        "n_estimators",
+    ),
+    "Gradient Boosting": (
+        GradientBoostingRegressor(random_state=42),
+        {"learning_rate": [0.02, 0.05, 0.1, 0.2], "max_depth": [2, 3, 4, 5],
+         "subsample": [0.7, 0.85, 1.0], "min_samples_leaf": [1, 3, 9]},
+        "n_estimators",
+    ),
+    "Decision Tree": (
+        DecisionTreeRegressor(random_state=42),
+        {"max_depth": [4, 6, 8, 12, None], "min_samples_leaf": [1, 2, 5, 10, 20]},
+        "n_samples",
+    ),
+    "K-Neighboors Regressor": (
+        KNeighborsRegressor(),
+        {"n_neighbors": [3, 5, 8, 12, 20], "weights": ["uniform", "distance"]},
+        "n_samples",
+    ),
+}
+
+
+@dataclass
+class HyperparameterSearchConfig:
+    enabled: bool = False
+    # which SEARCH_SPACES entries to tune
+    models: list = field(default_factory=lambda: list(SEARCH_SPACES))
+    n_candidates_per_model: int = 12
+    # keep the best 1/eta of the trials after every rung
+    eta: int = 3
+    # full budget: trees for ensembles, all training rows for the rest
+    max_estimators: int = 300
+    min_budget_fraction: float = 1 / 27
+    validation_fraction: float = 0.2
+    # rung trials are small, so they run inline unless asked otherwise
+    n_jobs: int = 1
+    # with n_jobs > 1 a group of trials only goes to the process pool when
+    # its rows x trees (rows for non-ensembles) adds up to at least this
+    parallel_min_work: int = 5_000_000
+    random_state: int = 42
+    # every finished trial is appended here; reruns skip recorded trials
+    history_path: str = os.path.join("../../models", "search_history.jsonl")
+
+
+class SuccessiveHalvingSearch:
+    """
+    Budget-aware search across SEARCH_SPACES. All sampled candidates are
+    scored on a held-out slice of the training data with a small budget,
+    the best 1/eta move to the next rung with eta times the budget, until
+    the survivors run at the full budget. Trials are keyed on the data,
+    estimator, parameters and budget, and persisted as they finish, so an
+    interrupted search resumes where it stopped.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or HyperparameterSearchConfig()
+        self.history = self._load_history()
+
+    def _load_history(self):
+        history = {}
+        if self.config.history_path and os.path.exists(self.config.history_path):
+            with open(self.config.history_path) as file_obj:
+                for line in file_obj:
+                    if line.strip():
+                        trial = json.loads(line)
+                        history[trial["trial_id"]] = trial
+        return history
+
+    def _record(self, trials):
+        if not self.config.history_path:
+            return
+        os.makedirs(os.path.dirname(self.config.history_path) or ".", exist_ok=True)
+        with open(self.config.history_path, "a") as file_obj:
+            for trial in trials:
+                file_obj.write(json.dumps(trial, default=str) + "\n")
+            file_obj.flush()
+            os.fsync(file_obj.fileno())
+
+    def _budgets(self):
+        n_rungs = 1 + max(0, math.floor(math.log(1 / self.config.min_budget_fraction, self.config.eta)))
+        return [self.config.eta ** (rung - n_rungs + 1) for rung in range(n_rungs)]
+
+    def _candidates(self):
+        candidates = []
+        for name in self.config.models:
+            _, space, _ = SEARCH_SPACES[name]
+            sampler = ParameterSampler(space, n_iter=self.config.n_candidates_per_model,
+                                       random_state=self.config.random_state)
+            candidates.extend((name, params) for params in sampler)
+        return candidates
+
+    def _build(self, name, params, budget, n_rows):
+        base, _, resource = SEARCH_SPACES[name]
+        estimator = base.__class__(**base.get_params()).set_params(**params)
+        if resource == "n_estimators":
+            estimator.set_params(n_estimators=max(1, round(budget * self.config.max_estimators)))
+            return estimator, n_rows
+        return estimator, max(20, int(budget * n_rows))
+
+    def _trial_id(self, data_key, name, params, budget):
+        payload = json.dumps([data_key, name, sorted(params.items()), budget], default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+    def run(self, x_train, y_train):
+        try:
+            x_fit, x_val, y_fit, y_val = train_test_split(
+                x_train, y_train, test_size=self.config.validation_fraction,
+                random_state=self.config.random_state)
+            digest = hashlib.sha256(np.ascontiguousarray(x_train).data)
+            digest.update(np.ascontiguousarray(y_train).data)
+            data_key = digest.hexdigest()
+
+            survivors = self._candidates()
+            budgets = self._budgets()
+            for rung, budget in enumerate(budgets):
+                scores = self._run_rung(rung, budget, survivors, data_key, x_fit, y_fit, x_val, y_val)
+                ranked = sorted(zip(scores, range(len(survivors))), reverse=True)
+                if rung < len(budgets) - 1:
+                    keep = max(1, math.ceil(len(survivors) / self.config.eta))
+                    survivors = [survivors[i] for _, i in ranked[:keep]]
+                    logging.info(f"search rung {rung} (budget {budget:.3f}): kept {keep} trials")
+
+            best_score, best_index = ranked[0]
+            best_name, best_params = survivors[best_index]
+            best_estimator, _ = self._build(best_name, best_params, 1.0, len(x_train))
+            logging.info(f"search best: {best_name} {best_params} validation r2 {best_score:.4f}")
+            return best_name, best_estimator, best_score
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _run_rung(self, rung, budget, candidates, data_key, x_fit, y_fit, x_val, y_val):
+        scores = [None] * len(candidates)
+        # trials that train on the same rows are evaluated together
+        groups = {}
+        for index, (name, params) in enumerate(candidates):
+            trial_id = self._trial_id(data_key, name, params, budget)
+            if trial_id in self.history:
+                scores[index] = self.history[trial_id]["score"]
+                continue
+            estimator, n_rows = self._build(name, params, budget, len(x_fit))
+            groups.setdefault(n_rows, {})[trial_id] = (index, name, params, estimator)
+
+        for n_rows, trials in groups.items():
+            work = sum(n_rows * trial[3].get_params().get("n_estimators", 1) for trial in trials.values())
+            n_jobs = self.config.n_jobs if work >= self.config.parallel_min_work else 1
+            report, details = evaluate_model(
+                x_train=x_fit[:n_rows], y_train=y_fit[:n_rows], x_test=x_val, y_test=y_val,
+                models={trial_id: trial[3] for trial_id, trial in trials.items()},
+                n_jobs=n_jobs, return_details=True)
+
+            finished = []
+            for trial_id, (index, name, params, _) in trials.items():
+                scores[index] = report[trial_id]
+                finished.append({
+                    "trial_id": trial_id, "model": name, "params": params,
+                    "rung": rung, "budget": budget, "n_rows": n_rows,
+                    "score": report[trial_id], "wall_time_s": details[trial_id]["wall_time_s"],
+                })
+            self._record(finished)
+            self.history.update({trial["trial_id"]: trial for trial in finished})
+        return scores
+
+
+@dataclass
+class ServingBudgetConfig:
+    # pick the most accurate candidate whose per-row latency and artifact
+    # size fit the serving budget, trying smaller variants of the best model
+    enabled: bool = False
+    # p95 rather than p99: a tail percentile of a few thousand single-row
+    # calls on a shared machine is mostly scheduler jitter
+    max_row_p95_ms: float = 1.0
+    max_artifact_mb: float = 20.0
+    # single-row predicts timed per candidate, cycling through the test rows
+    latency_calls: int = 2000
+    # 'sklearn': model.predict on the pickle that is saved to
+    # trainer_model_file_path. 'compiled': forests are timed on the
+    # pure-NumPy engine, and the selected model is then also exported as an
+    # array artifact to compiled_model_path, which is what has to be served
+    # (AMES_MODEL_PATH) for the measured latency to hold
+    engine: str = "sklearn"
+    compiled_model_path: str = os.path.join("../../models", "model")
+    # (n_estimators, max_depth) refits of the best forest
+    forest_variants: list = field(default_factory=lambda: [
+        (100, 16), (50, None), (50, 16), (50, 12), (25, 12), (25, 8), (10, 8)])
+    # also fit a small GBM on the best model's predictions
+    distill: bool = True
+    distill_params: dict = field(default_factory=lambda: {
+        "n_estimators": 200, "max_depth": 3, "learning_rate": 0.1})
+    # accuracy / latency / size of every candidate, written after training
+    report_path: str = os.path.join("../../models", "serving_budget.json")
 
 
 @dataclass
 class ModelTrainerConfig():
     trainer_model_file_path = os.path.join("../../models", "model.pkl")
+    # candidates fitted in parallel by evaluate_model (-1 = all cores)
+    n_jobs: int = -1
+    # fitted candidates keyed on data hash + hyperparameters; None disables
+    candidate_cache_dir: str = os.path.join("../../models", "candidate_cache")
+    search: HyperparameterSearchConfig = field(default_factory=HyperparameterSearchConfig)
+    # when enabled the best candidate is picked by its mean K-fold score on
+    # the training split; the test split is then only reported
+    cv: CrossValidationConfig = field(default_factory=CrossValidationConfig)
+    budget: ServingBudgetConfig = field(default_factory=ServingBudgetConfig)
+    # every training run is also published here as a new registry version
+    # (see publish_version); None keeps only trainer_model_file_path
+    registry_dir: str = os.path.join("../../models", "registry")
+    # make the new version active right away instead of leaving it for a
+    # canary/shadow rollout (the very first version is always activated)
+    activate_new_version: bool = False
+    # registry versions kept besides the routed ones (None keeps all)
+    keep_versions: int = 10
 
 class modelTrainer:
     def __init__(self):
         self.model_trainer_config = ModelTrainerConfig()
+        # {name: cross-validation report} of the last train_model call
+        self.cv_report = {}
+        # selected model and tradeoff curve of the last budgeted train_model call
+        self.budget_report = {}
         
     def initiate_model_trainer(self, train_array, test_array):
+        # combined [features | target] arrays, as built by initiate_data_transform
+        logging.info("split training and test input data")
+        return self.train_model(
+            x_train = train_array[:,:-1],
+            y_train = train_array[:,-1],
+            x_test = test_array[:,:-1],
+            y_test = test_array[:,-1]
+        )
+
+    def train_model(self, x_train, y_train, x_test, y_test):
+        # features and target as separate arrays, as returned by
+        # DataTransformation.transform_features
         try:
-            logging.info("split training and test input data")
-            x_train, y_train, x_test,y_test = (
-                train_array[:,:-1],
-                train_array[:,-1],
-                test_array[:,:-1],
-                test_array[:,-1]
-                
-            )
-            
             models = {
                 "Random Forest" : RandomForestRegressor(n_estimators=100, random_state=42),
                 # "Decision Tree": DecisionTreeRegressor(),
@@ -52,8 +281,31 @@ class modelTrainer:
                 # "Cat Boosting Regressor": CatBoostREgressor(verbose = False),
                 # "XGB Regressor":XGBRegressor()
             }
+
+            if self.model_trainer_config.search.enabled:
+                # the tuned candidate competes with the defaults on the test set
+                search_name, search_estimator, _ = SuccessiveHalvingSearch(
+                    self.model_trainer_config.search).run(x_train, y_train)
+                models[f"{search_name} (tuned)"] = search_estimator
+
+            if self.model_trainer_config.cv.enabled:
+                # before evaluate_model, which replaces the entries with fitted models
+                self.cv_report = cross_validate_models(models, x_train, y_train, self.model_trainer_config.cv)
             
-            model_report:dict = evaluate_model(x_train = x_train, y_train = y_train,x_test = x_test, y_test = y_test, models = models)
+            budget = self.model_trainer_config.budget
+            model_report, model_details = evaluate_model(
+                x_train = x_train, y_train = y_train,x_test = x_test, y_test = y_test, models = models,
+                n_jobs = self.model_trainer_config.n_jobs,
+                cache_dir = self.model_trainer_config.candidate_cache_dir,
+                return_details = True,
+                serving_calls = budget.latency_calls if budget.enabled else None,
+                serving_engine = budget.engine
+            )
+            for name, detail in model_details.items():
+                logging.info(f"candidate {name}: {detail}")
+
+            if self.cv_report:
+                model_report = {name: self.cv_report[name]["mean"] for name in model_report}
             
             ## to get the bet model score from dict
             
@@ -64,7 +316,13 @@ class modelTrainer:
             best_model_name = list(model_report.keys())[
                 list(model_report.values()).index(best_model_score)
             ]
-            
+
+            if budget.enabled:
+                best_model_name = self._select_within_budget(
+                    best_model_name, models, model_details, x_train, y_train, x_test, y_test)
+                best_model_score = (self.cv_report[best_model_name]["mean"] if self.cv_report
+                                    else model_details[best_model_name]["test_score"])
+
             best_model = models[best_model_name]
             
             if best_model_score<0.6:
@@ -76,6 +334,12 @@ class modelTrainer:
                 file_path= self.model_trainer_config.trainer_model_file_path,
                 obj = best_model
             )
+            if budget.enabled and model_details[best_model_name]["engine"] == "compiled":
+                from src.models.compiled_model import save_array_artifact
+
+                # the latency budget was checked on this engine, so ship it too
+                save_array_artifact(budget.compiled_model_path, best_model)
+                logging.info(f"serving budget holds when serving {budget.compiled_model_path}")
             
             predicted = best_model.predict(x_test)
             
@@ -84,4 +348,92 @@ class modelTrainer:
             return r2_Score, predicted
                 
         except Exception as e:
-            raise CustomException(e,sys)    
\ No newline at end of file
+            raise CustomException(e,sys)    
+
+    def _select_within_budget(self, teacher_name, models, model_details, x_train, y_train, x_test, y_test):
+        # adds pruned / distilled variants of the best model to `models`, then
+        # returns the most accurate candidate within the serving budget. With
+        # cross-validation on, the variants are cross-validated on the same
+        # folds as the other candidates and ranked by their mean CV r2, the
+        # score the teacher itself was picked by
+        budget = self.model_trainer_config.budget
+        cv = self.model_trainer_config.cv if self.cv_report else None
+        teacher = models[teacher_name]
+        evaluate = dict(x_test = x_test, y_test = y_test, return_details = True,
+                        n_jobs = self.model_trainer_config.n_jobs,
+                        cache_dir = self.model_trainer_config.candidate_cache_dir,
+                        serving_calls = budget.latency_calls, serving_engine = budget.engine)
+
+        variants = {}
+        if isinstance(teacher, RandomForestRegressor):
+            params = teacher.get_params()
+            for n_estimators, max_depth in budget.forest_variants:
+                if (n_estimators, max_depth) != (params["n_estimators"], params["max_depth"]):
+                    variants[f"{teacher_name} ({n_estimators} trees, depth {max_depth})"] = RandomForestRegressor(
+                        **dict(params, n_estimators = n_estimators, max_depth = max_depth))
+        if variants:
+            if cv:
+                self.cv_report.update(cross_validate_models(variants, x_train, y_train, cv))
+            _, details = evaluate_model(x_train = x_train, y_train = y_train, models = variants, **evaluate)
+            models.update(variants)
+            model_details.update(details)
+
+        if budget.distill:
+            # the student learns the teacher's predictions; it is still
+            # scored against the true test targets
+            student = {f"{teacher_name} distilled (GBM)": GradientBoostingRegressor(
+                random_state = 42, **budget.distill_params)}
+            teacher_predictions = teacher.predict(x_train)
+            if cv:
+                self.cv_report.update(cross_validate_models(
+                    student, x_train, y_train, cv, fit_target = teacher_predictions))
+            _, details = evaluate_model(x_train = x_train, y_train = teacher_predictions,
+                                        models = student, **evaluate)
+            models.update(student)
+            model_details.update(details)
+
+        metric = "cv_r2" if cv else "test_r2"
+        curve = sorted(({
+            "model": name,
+            "test_r2": detail["test_score"],
+            **({"cv_r2": self.cv_report[name]["mean"]} if cv else {}),
+            "row_p50_ms": detail["row_p50_ms"],
+            "row_p95_ms": detail["row_p95_ms"],
+            "row_p99_ms": detail["row_p99_ms"],
+            "artifact_mb": detail["artifact_mb"],
+            "engine": detail["engine"],
+            "within_budget": detail["row_p95_ms"] <= budget.max_row_p95_ms
+                             and detail["artifact_mb"] <= budget.max_artifact_mb,
+        } for name, detail in model_details.items()), key = lambda point: point["row_p95_ms"])
+        # candidates no faster-or-equal candidate beats on accuracy
+        best_so_far = -np.inf
+        for point in curve:
+            point["pareto"] = point[metric] > best_so_far
+            best_so_far = max(best_so_far, point[metric])
+        for point in curve:
+            logging.info(f"serving budget candidate: {point}")
+
+        within = [point for point in curve if point["within_budget"]]
+        selected = max(within, key = lambda point: point[metric]) if within else None
+
+        # written before any error below, so a failed budget can be inspected
+        self.budget_report = {
+            "budget": {"max_row_p95_ms": budget.max_row_p95_ms, "max_artifact_mb": budget.max_artifact_mb,
+                       "engine": budget.engine, "latency_calls": budget.latency_calls},
+            "selected": selected["model"] if selected else None,
+            "ranked_by": metric,
+            "curve": curve,
+        }
+        if budget.report_path:
+            os.makedirs(os.path.dirname(budget.report_path) or ".", exist_ok = True)
+            with open(budget.report_path, "w") as file_obj:
+                json.dump(self.budget_report, file_obj, indent = 2)
+
+        if selected is None:
+            raise ValueError(
+                f"no candidate meets the serving budget (p95 <= {budget.max_row_p95_ms} ms/row, "
+                f"artifact <= {budget.max_artifact_mb} MB); see {budget.report_path}")
+        logging.info(f"serving budget: selected {selected['model']} "
+                     f"({metric} {selected[metric]:.4f}, p95 {selected['row_p95_ms']:.3f} ms, "
+                     f"{selected['artifact_mb']:.1f} MB)")
+        return selected["model"]
@@ -0,0 +1,140 @@
+import os
+import sys
+import shutil
+import tempfile
+import weakref
+from dataclasses import dataclass
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from src.exception import CustomException
+from src.logger import logging
+
+
+@dataclass(frozen=True)
+class SharedArray:
+    """
+    Picklable handle to an array that lives outside the process heap:
+    a ``multiprocessing.shared_memory`` segment ('shm') or an ``.npy`` file
+    that is memory-mapped ('memmap'). Workers call ``open()`` and get a
+    read-only view on the same physical pages, so handing a matrix to N
+    processes costs N handles, not N copies.
+    """
+    kind: str
+    location: str
+    dtype: str
+    shape: tuple
+    offset: int = 0
+
+    def open(self):
+        if self.kind == "memmap":
+            return np.memmap(self.location, dtype=np.dtype(self.dtype), mode="r",
+                             offset=self.offset, shape=self.shape)
+        segment = _attach(self.location)
+        view = np.ndarray(self.shape, dtype=np.dtype(self.dtype), buffer=segment.buf)
+        view.flags.writeable = False
+        return view
+
+    @property
+    def nbytes(self):
+        return int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+
+
+# segments attached in this process, kept open for as long as views may use them
+_attached = {}
+
+
+def _attach(name):
+    # pool workers share their parent's resource tracker, which already
+    # tracks the segment; the owner's unlink is what releases it
+    if name not in _attached:
+        _attached[name] = shared_memory.SharedMemory(name=name)
+    return _attached[name]
+
+
+def _file_offset(array):
+    # byte position of a memmap view's first element in its file. A slice
+    # such as m[5:8] inherits m.offset unchanged, so the distance to the
+    # memmap that owns the mapping (whose data starts at its own offset) is added
+    root = array
+    while isinstance(root.base, np.memmap):
+        root = root.base
+    return root.offset + (array.ctypes.data - root.ctypes.data)
+
+
+def open_shared(value):
+    # SharedArray -> view; anything else is passed through unchanged
+    return value.open() if isinstance(value, SharedArray) else value
+
+
+class SharedArrays:
+    """
+    Owner of the shared copies of a set of arrays (e.g. the train/test
+    matrices from ``transform_features``). Arrays that are already
+    file-backed memmaps (``np.load(..., mmap_mode='r')``) are referenced in
+    place; the rest are copied once into shared memory or, with
+    ``backend='memmap'``, into ``.npy`` files in a temporary directory.
+    ``close()`` (or leaving the ``with`` block, or interpreter exit)
+    releases the segments and files.
+    """
+
+    def __init__(self, backend="shm", temp_dir=None):
+        if backend not in ("shm", "memmap"):
+            raise ValueError(f"unknown shared array backend: {backend}")
+        self.backend = backend
+        self._segments = []
+        self._dir = tempfile.mkdtemp(prefix="ames-shared-", dir=temp_dir) if backend == "memmap" else None
+        self._finalizer = weakref.finalize(self, _release, self._segments, self._dir)
+
+    def share(self, array):
+        try:
+            if isinstance(array, np.memmap) and array.filename and array.flags.c_contiguous:
+                return SharedArray("memmap", array.filename, array.dtype.str, array.shape, _file_offset(array))
+
+            array = np.ascontiguousarray(array)
+            if self.backend == "memmap":
+                path = os.path.join(self._dir, f"array-{len(os.listdir(self._dir))}.npy")
+                np.save(path, array)
+                mapped = np.load(path, mmap_mode="r")
+                return SharedArray("memmap", path, array.dtype.str, array.shape, mapped.offset)
+
+            # zero-size segments are not allowed
+            segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            self._segments.append(segment)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+            return SharedArray("shm", segment.name, array.dtype.str, array.shape)
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def close(self):
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _release(segments, directory):
+    # weakref.finalize also runs this at interpreter exit
+    for segment in segments:
+        try:
+            segment.close()
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+    segments.clear()
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+    logging.debug("released shared arrays")
+
+
+@contextmanager
+def share_arrays(*arrays, backend="shm", temp_dir=None):
+    # with share_arrays(x_train, y_train) as (x_handle, y_handle): ...
+    with SharedArrays(backend, temp_dir) as owner:
+        yield tuple(owner.share(array) for array in arrays)
+
@@ -0,0 +1,76 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import (
+    AdaBoostRegressor,
+    ExtraTreesRegressor,
+    GradientBoostingRegressor,
+    RandomForestRegressor,
+)
+from sklearn.tree import DecisionTreeRegressor
+
+from src.features.build_features import DataTransformation
+from src.models.compiled_model import (
+    CompiledForest,
+    CompiledPipeline,
+    check_parity,
+    load_array_artifact,
+    save_array_artifact,
+)
+from src.models.predict_model import FEATURE_COLUMNS
+
+
+@pytest.fixture(scope="module")
+def training_data():
+    rng = np.random.default_rng(0)
+    features = pd.DataFrame(rng.normal(size=(300, len(FEATURE_COLUMNS))) * 100 + 1000,
+                            columns=FEATURE_COLUMNS)
+    target = features.iloc[:, 0] * 3 + features.iloc[:, 1] ** 2 / 100 + rng.normal(size=300)
+    # missing values go through the imputer's fill vector
+    features.iloc[::7, 2] = np.nan
+    preprocessor = DataTransformation().get_data_transformer_object()
+    return preprocessor.fit_transform(features), target.to_numpy(), preprocessor, features
+
+
+@pytest.mark.parametrize("model", [
+    RandomForestRegressor(n_estimators=25, random_state=0),
+    ExtraTreesRegressor(n_estimators=25, random_state=0),
+    DecisionTreeRegressor(max_depth=8, random_state=0),
+])
+def test_compiled_pipeline_matches_sklearn(training_data, model):
+    x, y, preprocessor, features = training_data
+    model.fit(x, y)
+    compiled = CompiledPipeline.from_sklearn(preprocessor, model)
+    assert check_parity(compiled, preprocessor, model, features) < 1e-6
+
+
+@pytest.mark.parametrize("model", [
+    GradientBoostingRegressor(n_estimators=10, random_state=0),
+    AdaBoostRegressor(n_estimators=10, random_state=0),
+])
+def test_boosted_models_are_rejected(training_data, model):
+    x, y, _, _ = training_data
+    model.fit(x, y)
+    with pytest.raises(ValueError, match="cannot be compiled"):
+        CompiledForest.from_sklearn(model)
+
+
+@pytest.mark.parametrize("damage", [
+    lambda array: array.astype(np.float32 if array.dtype != np.float32 else np.float64),
+    lambda array: array[:-1],
+])
+def test_artifact_arrays_must_match_the_manifest(training_data, tmp_path, damage):
+    x, y, _, _ = training_data
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(x, y)
+    path = save_array_artifact(str(tmp_path / "model"), model)
+    np.testing.assert_allclose(load_array_artifact(path).predict(x), model.predict(x))
+
+    with open(os.path.join(path, "manifest.json")) as file_obj:
+        spec = next(iter(json.load(file_obj)["arrays"].values()))
+    array_path = os.path.join(path, spec["file"])
+    np.save(array_path, damage(np.load(array_path)))
+    with pytest.raises(ValueError, match="manifest says"):
+        load_array_artifact(path)
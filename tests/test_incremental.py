@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from src import load_frame, save_frame, save_object
+from src.features.build_features import NUMERICAL_FEATURES, TARGET_COLUMN
+from src.features.streaming_stats import StreamingFeatureStats
+from src.models.incremental import IncrementalTrainer, IncrementalTrainerConfig, rescale_thresholds
+
+
+def sales(n, seed, shift=0.0):
+    # the model features + price, without missing values, so no row goes
+    # through the imputer's fill value
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(n, len(NUMERICAL_FEATURES))) * 100 + 1000 + shift,
+                      columns=NUMERICAL_FEATURES)
+    df[TARGET_COLUMN] = df.iloc[:, 0] * 50 + df.iloc[:, 1] ** 2 / 10 + rng.normal(size=n) * 100
+    return df
+
+
+def fit_pair(df, n_estimators=10):
+    stats = StreamingFeatureStats()
+    stats.update(df)
+    preprocessor = stats.to_preprocessor()
+    forest = RandomForestRegressor(n_estimators=n_estimators, random_state=0)
+    forest.fit(preprocessor.transform(df), df[TARGET_COLUMN].to_numpy())
+    return stats, preprocessor, forest
+
+
+def test_rescale_thresholds_keeps_predictions_on_raw_inputs():
+    base = sales(400, seed=0)
+    stats, old_preprocessor, forest = fit_pair(base)
+    raw = sales(300, seed=1)
+    before = forest.predict(old_preprocessor.transform(raw))
+
+    # new rows move the scaler's mean and scale
+    stats.update(sales(200, seed=2, shift=300.0))
+    new_preprocessor = stats.to_preprocessor()
+    assert not np.allclose(old_preprocessor.transform(raw), new_preprocessor.transform(raw))
+
+    rescale_thresholds(forest, old_preprocessor, new_preprocessor)
+    np.testing.assert_allclose(forest.predict(new_preprocessor.transform(raw)), before, rtol=0, atol=1e-9)
+
+
+@pytest.fixture
+def trainer(tmp_path):
+    base = sales(400, seed=0)
+    save_frame(base, str(tmp_path / "train.parquet"))
+    stats, preprocessor, forest = fit_pair(base)
+    save_object(str(tmp_path / "model.pkl"), forest)
+    save_object(str(tmp_path / "preprocessor.pkl"), preprocessor)
+    return IncrementalTrainer(IncrementalTrainerConfig(
+        model_path=str(tmp_path / "model.pkl"),
+        preprocessor_path=str(tmp_path / "preprocessor.pkl"),
+        stats_path=str(tmp_path / "preprocessor_stats.pkl"),
+        state_path=str(tmp_path / "incremental_state.json"),
+        base_train_path=str(tmp_path / "train.parquet"),
+        increments_dir=str(tmp_path / "train_increments"),
+        trees_per_refresh=5,
+    ))
+
+
+def test_refresh_continues_from_its_own_state(trainer):
+    first = trainer.refresh(sales(50, seed=3))
+    second = trainer.refresh(sales(50, seed=4))
+    assert (first["refresh"], second["refresh"]) == (1, 2)
+    assert second["rows_seen"] == 400 + 50 + 50
+
+
+def test_full_retrain_reseeds_statistics_and_sets_increments_aside(trainer):
+    trainer.refresh(sales(50, seed=3))
+    assert len(trainer._stored_parts()) == 1
+
+    # make_dataset.py replaces the pair with one fitted on the base split
+    # only, with as many trees as the refreshed forest has
+    _, preprocessor, forest = fit_pair(load_frame(trainer.config.base_train_path), n_estimators=15)
+    save_object(trainer.config.model_path, forest)
+    save_object(trainer.config.preprocessor_path, preprocessor)
+
+    result = trainer.refresh(sales(50, seed=4))
+    assert result["refresh"] == 1
+    assert result["rows_seen"] == 400 + 50
+    assert len(trainer._stored_parts()) == 1
+    assert len(os.listdir(os.path.join(trainer.config.increments_dir, "superseded"))) == 1
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.features.feature_spec import FEATURES, FORM_FIELDS, MODEL_FEATURES
+from src.models.input_record import FieldValidationError, HouseFeatures
+from src.models.predict_model import validate_features
+
+FORM = {
+    'Overall_Qual': '7', 'Gr_Liv_Area': '1500', 'Garage_Cars': '2', 'Garage_Area': '480',
+    'First_Flr_SF': '900', 'Total_Bsmt_SF': '880', 'Lot_Area': '9000', 'BsmtFin_SF_1': '400',
+    'Full_Bath': '2', 'Yr_Sold': '2010', 'Year_Remod_Add': '2000',
+    # inputs only the extended feature set uses
+    'Second_Flr_SF': '600', 'Year_Built': '1995',
+}
+
+
+def test_form_fields_are_the_raw_inputs_of_the_model_features():
+    assert all(field is not None for field, _ in FORM_FIELDS)
+    assert not any(FEATURES[column].derived for column in FEATURES if FEATURES[column].field in dict(FORM_FIELDS))
+
+
+def test_parse_computes_derived_features_from_their_inputs():
+    row = HouseFeatures.parse(FORM).row
+    assert row.shape == (1, len(MODEL_FEATURES))
+    assert row[0, MODEL_FEATURES.index('year_since_remod')] == 10
+
+
+def test_parse_accepts_a_derived_feature_sent_directly():
+    form = {k: v for k, v in FORM.items() if k != 'Year_Remod_Add'}
+    row = HouseFeatures.parse(dict(form, year_since_remod='4')).row
+    assert row[0, MODEL_FEATURES.index('year_since_remod')] == 4
+
+
+def test_parse_reports_missing_inputs():
+    form = {k: v for k, v in FORM.items() if k != 'Yr_Sold'}
+    with pytest.raises(FieldValidationError) as error:
+        HouseFeatures.parse(form)
+    assert error.value.errors == {'Yr_Sold': 'missing'}
+
+
+def test_api_records_get_the_same_row_as_the_form():
+    record = {column: float(FORM[FEATURES[column].field]) for column in FEATURES if FEATURES[column].field in FORM}
+    features = validate_features(pd.DataFrame([record]))
+    assert list(features.columns) == MODEL_FEATURES
+    np.testing.assert_array_equal(features.to_numpy(), HouseFeatures.parse(FORM).row)
+
+
+@pytest.mark.parametrize("value", ['2.5', 2.5, float('inf'), 'abc'])
+def test_int_fields_reject_non_integers(value):
+    with pytest.raises(FieldValidationError) as error:
+        HouseFeatures.parse(dict(FORM, Full_Bath=value))
+    assert list(error.value.errors) == ['Full_Bath']
+
+
+@pytest.mark.parametrize("value", ['2', 2, 2.0])
+def test_int_fields_accept_whole_numbers(value):
+    record = HouseFeatures.parse(dict(FORM, Full_Bath=value))
+    assert record.Full_Bath == 2 and isinstance(record.Full_Bath, int)
@@ -0,0 +1,147 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import save_object
+from src.models.model_registry import (
+    ModelRegistry,
+    ModelRegistryConfig,
+    VersionedModelRegistry,
+    publish_version,
+    read_registry_manifest,
+    set_routing,
+)
+
+
+def test_pair_is_swapped_only_when_both_artifacts_load(tmp_path):
+    model_path = str(tmp_path / "model.pkl")
+    preprocessor_path = str(tmp_path / "preprocessor.pkl")
+    save_object(model_path, "model-1")
+    save_object(preprocessor_path, "preprocessor-1")
+    registry = ModelRegistry(ModelRegistryConfig(
+        model_path=model_path, preprocessor_path=preprocessor_path, check_interval=0, registry_dir=None))
+    assert registry.get() == ("model-1", "preprocessor-1")
+    first_version = registry.version
+
+    # new model lands while the preprocessor is still being written
+    save_object(model_path, "model-2")
+    with open(preprocessor_path, "wb") as file_obj:
+        file_obj.write(b"\x80\x04partial")
+    assert registry.get() == ("model-1", "preprocessor-1")
+    assert registry.version == first_version
+
+    save_object(preprocessor_path, "preprocessor-2")
+    assert registry.get() == ("model-2", "preprocessor-2")
+    assert registry.select()[1:] == ("model-2", "preprocessor-2")
+    assert sorted(os.listdir(tmp_path)) == ["model.pkl", "preprocessor.pkl"]
+
+
+def _publish_one(root, model_path, preprocessor_path):
+    return publish_version(root, model_path, preprocessor_path, keep=None)
+
+
+def test_concurrent_publishes_each_get_a_version(tmp_path):
+    save_object(str(tmp_path / "model.pkl"), "model")
+    save_object(str(tmp_path / "preprocessor.pkl"), "preprocessor")
+    root = str(tmp_path / "registry")
+    args = (root, str(tmp_path / "model.pkl"), str(tmp_path / "preprocessor.pkl"))
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        versions = list(pool.map(_publish_one, *zip(*[args] * 8)))
+
+    assert sorted(versions) == [f"v{n:04d}" for n in range(1, 9)]
+    assert sorted(read_registry_manifest(root)["versions"]) == sorted(versions)
+
+
+def test_publish_keeps_newest_and_routed_versions(tmp_path):
+    save_object(str(tmp_path / "model.pkl"), "model")
+    save_object(str(tmp_path / "preprocessor.pkl"), "preprocessor")
+    root = str(tmp_path / "registry")
+    publish = lambda: publish_version(root, str(tmp_path / "model.pkl"), str(tmp_path / "preprocessor.pkl"), keep=2)
+
+    for _ in range(3):
+        publish()
+    set_routing(root, canary="v0002", canary_percent=5)
+    for _ in range(3):
+        publish()
+
+    # v0001 is active, v0002 the canary, v0005/v0006 the two newest
+    kept = ["v0001", "v0002", "v0005", "v0006"]
+    assert sorted(read_registry_manifest(root)["versions"]) == kept
+    assert sorted(p for p in os.listdir(root) if p.startswith("v")) == kept
+
+
+class FramePreprocessor:
+    def transform(self, features):
+        return features.to_numpy(dtype=np.float64)
+
+
+class OffsetModel:
+    def __init__(self, offset):
+        self.offset = offset
+
+    def predict(self, x):
+        return x.sum(axis=1) + self.offset
+
+
+@pytest.fixture
+def registry_root(tmp_path):
+    root = str(tmp_path / "registry")
+    save_object(str(tmp_path / "preprocessor.pkl"), FramePreprocessor())
+    for offset in (0.0, 10.0):
+        save_object(str(tmp_path / "model.pkl"), OffsetModel(offset))
+        publish_version(root, str(tmp_path / "model.pkl"), str(tmp_path / "preprocessor.pkl"))
+    return root
+
+
+def test_broken_canary_keeps_serving_the_active_version(registry_root, monkeypatch):
+    registry = VersionedModelRegistry(registry_root, check_interval=0.2)
+    assert registry.get()[0].offset == 0.0
+
+    with open(f"{registry_root}/v0002/model.pkl", "wb") as file_obj:
+        file_obj.write(b"\x80\x04broken")
+    set_routing(registry_root, canary="v0002", canary_percent=5)
+    loads = []
+    load_pair = registry._load_pair
+    monkeypatch.setattr(registry, "_load_pair", lambda *args: loads.append(args) or load_pair(*args))
+    registry._last_check = None
+
+    for _ in range(5):
+        model, _ = registry.get()
+        assert model.offset == 0.0
+    assert registry.routing()["canary"] is None
+    # one failed attempt per check interval, not one per request
+    assert len(loads) == 1
+
+
+def test_canary_share_is_sticky_per_routing_key(registry_root):
+    set_routing(registry_root, canary="v0002", canary_percent=30)
+    registry = VersionedModelRegistry(registry_root, check_interval=None)
+
+    routed = [registry.select(routing_key=key)[0] for key in range(1000)]
+    assert 0.2 < routed.count("v0002") / len(routed) < 0.4
+    assert [registry.select(routing_key=key)[0] for key in range(1000)] == routed
+    version, model, _ = registry.select(routing_key=routed.index("v0002"))
+    assert (version, model.offset) == ("v0002", 10.0)
+
+
+def test_shadow_scorer_tracks_disagreement_with_served(registry_root):
+    set_routing(registry_root, shadow="v0002")
+    registry = VersionedModelRegistry(registry_root, check_interval=None)
+    features = pd.DataFrame({"a": [1.0, 2.0, 3.0]})
+
+    version, model, preprocessor = registry.select()
+    preds = model.predict(preprocessor.transform(features))
+    assert version == "v0001"
+    registry.submit_shadow(features, preds)
+
+    deadline = time.monotonic() + 5
+    while registry.shadow_scorer.stats()["rows_scored"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stats = registry.routing()["shadow_stats"]
+    assert stats["shadow_version"] == "v0002"
+    assert stats["rows_scored"] == 3
+    assert stats["mean_abs_diff"] == stats["max_abs_diff"] == 10.0
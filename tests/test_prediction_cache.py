@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.models import prediction_cache
+from src.models.prediction_cache import PredictionCache, PredictionCacheConfig, canonical_key
+from src.models.predict_model import FEATURE_COLUMNS
+
+
+class Model:
+    # sum of the features; records the rows of every call
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, rows):
+        rows = np.asarray(rows, dtype=np.float64)
+        self.calls.append(rows.copy())
+        return np.nansum(rows, axis=1)
+
+
+def rows(*firsts):
+    # one row per value, differing in the first feature only
+    out = np.ones((len(firsts), len(FEATURE_COLUMNS)))
+    out[:, 0] = firsts
+    return out
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(prediction_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_canonical_key_merges_equal_values():
+    assert canonical_key([1, -0.0, np.nan]) == canonical_key([1.0, 0.0, float("nan")])
+
+
+def test_partial_miss_computes_only_the_missing_rows_in_order():
+    cache, model = PredictionCache(), Model()
+    cache.predict(rows(1, 3), model, "v1")
+
+    batch = rows(5, 1, 4, 3)
+    preds = cache.predict(batch, model, "v1")
+    np.testing.assert_array_equal(preds, model(batch))
+    # one call for the two misses, in request order
+    np.testing.assert_array_equal(model.calls[1][:, 0], [5, 4])
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_partial_miss_on_a_frame_passes_the_missing_rows():
+    cache, model = PredictionCache(), Model()
+    frame = pd.DataFrame(rows(1, 2, 3), columns=FEATURE_COLUMNS)
+    cache.predict(frame.iloc[[1]], lambda df: model(df[FEATURE_COLUMNS]), "v1")
+
+    preds = cache.predict(frame, lambda df: model(df[FEATURE_COLUMNS]), "v1")
+    np.testing.assert_array_equal(preds, frame.sum(axis=1))
+    np.testing.assert_array_equal(model.calls[1][:, 0], [1, 3])
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache, model = PredictionCache(PredictionCacheConfig(ttl=10.0)), Model()
+    cache.predict(rows(1), model, "v1")
+
+    clock[0] += 9.0
+    cache.predict(rows(1), model, "v1")
+    assert len(model.calls) == 1
+
+    clock[0] += 2.0
+    cache.predict(rows(1), model, "v1")
+    assert len(model.calls) == 2
+    assert cache.expirations == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache, model = PredictionCache(PredictionCacheConfig(max_entries=2)), Model()
+    cache.predict(rows(1, 2), model, "v1")
+    # touching 1 makes 2 the least recently used
+    cache.predict(rows(1), model, "v1")
+    cache.predict(rows(3), model, "v1")
+    assert cache.evictions == 1
+
+    cache.predict(rows(1, 2), model, "v1")
+    np.testing.assert_array_equal(model.calls[-1][:, 0], [2])
+
+
+def test_new_model_version_drops_the_cache():
+    cache, model = PredictionCache(), Model()
+    cache.predict(rows(1, 2), model, "v1")
+    cache.predict(rows(1, 2), model, "v2")
+    assert len(model.calls) == 2
+    assert cache.invalidations == 1
+    assert cache.stats()["model_version"] == "v2"
+
+
+def test_results_computed_for_an_old_version_are_not_stored():
+    cache = PredictionCache()
+    cache.lookup([canonical_key(rows(1)[0])], "v1")
+    # the model changed while v1 predictions were being computed
+    cache.lookup([], "v2")
+    cache.store([canonical_key(rows(1)[0])], [1.0], "v1")
+    assert cache.stats()["entries"] == 0
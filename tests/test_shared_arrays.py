@@ -0,0 +1,23 @@
+import numpy as np
+
+from src.shared_arrays import share_arrays
+
+
+def test_sliced_memmap_is_shared_at_its_own_rows(tmp_path):
+    path = tmp_path / "x.npy"
+    np.save(path, np.arange(40.0).reshape(10, 4))
+    mapped = np.load(path, mmap_mode="r")
+
+    with share_arrays(mapped, mapped[5:8], mapped[5:8][1:]) as (whole, rows, nested):
+        assert whole.kind == rows.kind == "memmap"
+        np.testing.assert_array_equal(whole.open(), mapped)
+        np.testing.assert_array_equal(rows.open(), mapped[5:8])
+        np.testing.assert_array_equal(nested.open(), mapped[6:8])
+
+
+def test_in_memory_arrays_are_copied_and_released():
+    x = np.arange(12.0).reshape(3, 4)
+    with share_arrays(x, x[:, :2]) as (whole, columns):
+        assert whole.kind == "shm"
+        np.testing.assert_array_equal(whole.open(), x)
+        np.testing.assert_array_equal(columns.open(), x[:, :2])
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import save_frame
+from src.features.build_features import DataTransformation, NUMERICAL_FEATURES
+from src.features.streaming_stats import (
+    StreamingFeatureStats,
+    compare_preprocessors,
+    fit_preprocessor_out_of_core,
+)
+
+
+@pytest.fixture(scope="module")
+def frame():
+    # skewed like the Ames areas, with missing values in every column
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.lognormal(mean=6, sigma=0.5, size=(20000, len(NUMERICAL_FEATURES))),
+                      columns=NUMERICAL_FEATURES)
+    df = df.mask(rng.random(df.shape) < 0.05)
+    return df
+
+
+@pytest.mark.parametrize("suffix", ["parquet", "csv"])
+def test_out_of_core_fit_matches_the_in_memory_preprocessor(tmp_path, frame, suffix):
+    path = str(tmp_path / f"train.{suffix}")
+    save_frame(frame, path)
+
+    preprocessor, stats = fit_preprocessor_out_of_core(path, chunk_size=1000, sketch_size=512)
+    # more rows than the sketch holds, so the medians are approximate
+    assert stats.n_rows == len(frame)
+    assert not any(sketch.exact for sketch in stats.sketches)
+
+    reference = DataTransformation().get_data_transformer_object().fit(frame)
+    report = compare_preprocessors(reference, preprocessor)
+    assert report["within_tolerance"], report
+
+
+def test_merged_stats_equal_one_pass(frame):
+    one_pass = StreamingFeatureStats().update(frame)
+    merged = StreamingFeatureStats().update(frame.iloc[:7000]).merge(StreamingFeatureStats().update(frame.iloc[7000:]))
+    np.testing.assert_allclose(merged.mean, one_pass.mean)
+    np.testing.assert_allclose(merged.m2, one_pass.m2)
+    np.testing.assert_array_equal(merged.count, one_pass.count)